@@ -1,7 +1,6 @@
 import customtkinter as ctk
 from tkinter import filedialog, Label, Frame, messagebox
-from PIL import Image, ImageTk, ImageDraw, ImageFont, ImageOps
-from ultralytics import YOLO
+from PIL import Image, ImageTk
 import numpy as np
 import threading
 import os
@@ -10,14 +9,63 @@ import webbrowser
 from datetime import datetime
 import cv2
 
-# Load the YOLOv8 model
-model = YOLO("E:\Brain-Tumor App\best.pt")
+from inference_worker import InferencePool
+from ui_dispatch import UIDispatcher
+from result_cache import ResultCache
+from image_loader import ScanImage, decode_scan, load_draft_preview, open_scan_image, to_pil
+from volume import open_volume, iter_slice_batches
+from history_store import HistoryStore
+from history_list import VirtualHistoryList
+from stats import DetectionStats
+from instrumentation import tracer
+from backends import BACKENDS, PRECISIONS, check_precision
+from settings import load_settings, save_settings
+from tiling import submit_tiled
+from overlay import OverlayRenderer, render_full
+from render_cache import RenderCache, record_signature, themed_preview
+from exporter import EXPORT_FORMATS, ResultExporter
+from watch_folder import WatchIngest
+from http_service import DetectionService
+from model_registry import ModelRegistry
+from concurrent.futures import Future
+
+settings = load_settings()
+
+# YOLOv8 weights, loaded by the inference server once the window is up; this is the
+# "default" entry of the model registry until other versions are added
+MODEL_PATH = r"E:\Brain-Tumor App\best.pt"
+DETECTION_CONF = 0.25
+model_registry = ModelRegistry(default_weights=MODEL_PATH)
+if settings["model"] not in model_registry.models:
+    settings["model"] = model_registry.names()[0]
+active_model = settings["model"]  # name of the model inference_pool runs
+inference_pool = None
+loading_pool = None  # replacement pool loading in the background while inference_pool keeps serving
+result_cache = ResultCache(model_registry.weights(active_model))
+model_state = "loading"  # loading -> warming -> ready (or failed)
+ADD_MODEL = "➕ Add model..."
 
 # Global variables
 img_path = None
+current_scan = None
+current_result = None  # (scan, record) shown in the result panel, re-rendered at full size on save
+shown_entry = None  # history entry shown in the result panel instead, if one was clicked
+overlay_renderer = OverlayRenderer()
+render_cache = RenderCache()
+watch_ingest = None
+http_service = None
+result_exporter = ResultExporter(fmt=settings["export_format"], quality=settings["export_quality"],
+                                 png_compression=settings["export_png_compression"])
+draft_preview = None
+detect_when_loaded = False
+show_timings = bool(os.environ.get("NEUROVISION_SHOW_TIMINGS"))
 dark_mode = False
-processing = False
-history = []
+pending_scans = 0
+current_volume = None
+volume_results = {}
+VOLUME_BATCH_SIZE = 8
+history = HistoryStore()
+detection_stats = DetectionStats()
 current_theme = None
 
 # Color Themes
@@ -129,25 +177,37 @@ def apply_theme():
     detect_label.configure(bg=theme["image_bg"])
     
     upload_button.configure(fg_color=theme["button_primary"], hover_color=adjust_color(theme["button_primary"], -20))
+    volume_button.configure(fg_color=theme["button_primary"], hover_color=adjust_color(theme["button_primary"], -20))
+    slice_label.configure(text_color=theme["text_secondary"])
+    tiled_switch.configure(text_color=theme["text_primary"], progress_color=theme["button_primary"])
     detect_button.configure(fg_color=theme["button_secondary"], hover_color=adjust_color(theme["button_secondary"], -20))
     clear_button.configure(fg_color=theme["warning"], hover_color=adjust_color(theme["warning"], -20))
     save_button.configure(fg_color=theme["accent"], hover_color=adjust_color(theme["accent"], -20))
+    save_all_button.configure(fg_color=theme["accent"], hover_color=adjust_color(theme["accent"], -20))
+    export_format_menu.configure(fg_color=theme["accent"], button_color=adjust_color(theme["accent"], -20))
     help_button.configure(fg_color=theme["header"], hover_color=adjust_color(theme["header"], 20))
+    timings_button.configure(fg_color=theme["header"], hover_color=adjust_color(theme["header"], 20))
+    watch_button.configure(fg_color=theme["header"], hover_color=adjust_color(theme["header"], 20))
+    backend_menu.configure(fg_color=theme["button_primary"], button_color=adjust_color(theme["button_primary"], -20))
+    model_menu.configure(fg_color=theme["button_primary"], button_color=adjust_color(theme["button_primary"], -20))
     
     theme_button.configure(text=f"🎨 {current_theme['name'].replace('_', ' ').title()}"[:10],
                          fg_color=theme["accent"], hover_color=adjust_color(theme["accent"], -20))
     
     status_bar.configure(fg_color=theme["status_bar"])
     status_label.configure(text_color=theme["status_text"])
+    timing_label.configure(text_color=theme["status_text"])
     
-    # Update history buttons
-    for btn in history_buttons:
-        btn.configure(fg_color=theme["button_primary"], hover_color=adjust_color(theme["button_primary"], -20))
+    # Update history buttons (only the rows currently materialized)
+    history_list.apply_theme(theme)
     
     # Update stats labels
     stats_positive.configure(text_color=theme["positive"])
     stats_negative.configure(text_color=theme["negative"])
     stats_total.configure(text_color=theme["text_primary"])
+    stats_latency.configure(text_color=theme["text_secondary"])
+    stats_throughput.configure(text_color=theme["text_secondary"])
+    stats_confidence.configure(text_color=theme["text_secondary"])
     
     # Redraw images with current theme
     if img_path:
@@ -168,45 +228,69 @@ def adjust_color(hex_color, amount):
     return f"#{adjusted[0]:02x}{adjusted[1]:02x}{adjusted[2]:02x}"
 
 def display_uploaded_image():
-    global img_path
-    if img_path:
-        img = Image.open(img_path)
-        img = img.resize((400, 400))
-        
-        # Apply theme-appropriate enhancements
-        if current_theme["name"] == "dark":
-            img = ImageOps.autocontrast(img)
-        elif current_theme["name"] == "high_contrast":
-            img = ImageOps.invert(img)
-        
-        img_tk = ImageTk.PhotoImage(img)
-        upload_label.config(image=img_tk)
-        upload_label.image = img_tk
+    if current_scan is not None:
+        # The preview is derived from the already decoded scan, never re-read from disk
+        show_upload_preview(current_scan.preview((400, 400)), key=current_scan.trace_id)
+    elif draft_preview is not None:
+        show_upload_preview(draft_preview)
+
+def show_upload_preview(img, key=None):
+    theme_name = current_theme["name"]
+    render = lambda: ImageTk.PhotoImage(themed_preview(img, theme_name))
+    # Cached per scan and theme, so toggling themes skips the filters and the PhotoImage conversion
+    img_tk = render_cache.get(("upload", key, theme_name, img.size), render) if key is not None else render()
+    upload_label.config(image=img_tk)
+    upload_label.image = img_tk
+
+def result_photo(scan, record, result_img=None, size=(400, 400)):
+    """PhotoImage of a scan's overlay in the current theme, rendered once per theme"""
+    def render():
+        if result_img is not None:
+            return ImageTk.PhotoImage(result_img)
+        return ImageTk.PhotoImage(overlay_renderer.render(scan.preview(size), record, current_theme))
+    return render_cache.get(("result", scan.trace_id, record_signature(record), current_theme["name"], size), render)
 
 def display_detection_result():
-    if hasattr(detect_label, 'image'):
+    if current_volume is not None:
+        show_volume_slice(int(round(slice_slider.get())))
+    elif current_result is not None and current_result[0] is current_scan:
+        # Overlay colours follow the theme
+        img_tk = result_photo(*current_result)
+        detect_label.config(image=img_tk)
+        detect_label.image = img_tk
+    elif hasattr(detect_label, 'image'):
         img_tk = detect_label.image
         detect_label.config(image=img_tk)
         detect_label.image = img_tk
 
 def upload_image():
-    global img_path, processing
-    if processing:
-        return
+    global img_path, current_scan, draft_preview, detect_when_loaded, shown_entry
+    
+    close_volume()
         
     filetypes = [
-        ("Image Files", "*.jpg;*.png;*.jpeg"),
+        ("Image Files", "*.jpg;*.png;*.jpeg;*.tif;*.tiff;*.jp2"),
         ("DICOM Files", "*.dcm"),
         ("All Files", "*.*")
     ]
     
-    img_path = filedialog.askopenfilename(
+    selected_path = filedialog.askopenfilename(
         title="Select Medical Image",
         filetypes=filetypes,
         initialdir=os.path.expanduser("~")
     )
 
-    if img_path:
+    if selected_path:
+        img_path = selected_path
+        current_scan = None
+        shown_entry = None
+        detect_when_loaded = False
+        
+        # Show a scale-on-decode draft right away where the format allows it
+        try:
+            draft_preview = load_draft_preview(selected_path, (400, 400))
+        except Exception:
+            draft_preview = None
         display_uploaded_image()
         upload_title.configure(text=f"Uploaded: {os.path.basename(img_path)[:20]}...")
         detect_title.configure(text="Detection Result (Pending)")
@@ -217,147 +301,709 @@ def upload_image():
         detect_label.config(image=blank_tk)
         detect_label.image = blank_tk
         
-        update_status(f"Loaded: {os.path.basename(img_path)}")
+        update_status(f"Loading: {os.path.basename(img_path)}")
+        
+        # The full-resolution decode runs in the background and refines the preview
+        decode_thread = threading.Thread(target=decode_scan_in_background, args=(selected_path,))
+        decode_thread.daemon = True
+        decode_thread.start()
 
-def add_no_tumor_detection(original_img, confidence=0.9):
-    """Add white rectangle covering brain and text outside it"""
-    img = original_img.copy()
-    draw = ImageDraw.Draw(img)
-    theme = current_theme
-    
+def decode_scan_in_background(path):
+    trace_id = tracer.new_scan()
     try:
-        font = ImageFont.truetype("arial.ttf", 24)
-    except:
-        font = ImageFont.load_default()
-    
-    detection_text = f"No Tumor Detected ({confidence*100:.0f}%)"
-    
-    # Calculate text size
-    bbox = draw.textbbox((0, 0), detection_text, font=font)
-    text_width = bbox[2] - bbox[0]
-    text_height = bbox[3] - bbox[1]
-    
-    # Rectangle covering most of the brain
-    rect_margin = 30
-    rect_coords = (rect_margin, rect_margin, 400-rect_margin, 400-rect_margin)
-    
-    # Draw rectangle with theme-appropriate color
-    overlay = Image.new('RGBA', img.size, (255,255,255,0))
-    overlay_draw = ImageDraw.Draw(overlay)
-    overlay_draw.rectangle(rect_coords, 
-                          fill=(*hex_to_rgb(theme["negative"]), 100), 
-                          outline=theme["negative"], 
-                          width=3)
-    img = Image.alpha_composite(img.convert('RGBA'), overlay).convert('RGB')
-    draw = ImageDraw.Draw(img)
-    
-    # Draw text outside rectangle
-    text_x = 400 - text_width - 20
-    text_y = 400 - text_height - 20
-    draw.text((text_x, text_y), detection_text, 
-             fill=theme["negative"], 
-             font=font, 
-             stroke_width=2, 
-             stroke_fill=theme["bg"] if theme["name"] != "high_contrast" else "#000000")
-    
-    return img
-
-def hex_to_rgb(hex_color):
-    """Convert hex color to RGB tuple"""
-    hex_color = hex_color.lstrip('#')
-    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+        with tracer.stage("decode", scan=trace_id):
+            scan = ScanImage(path)
+        scan.trace_id = trace_id
+        with tracer.stage("preview", scan=trace_id):
+            scan.preview((400, 400))
+    except Exception as e:
+        ui_dispatcher.post(scan_decode_failed, path, e)
+        return
+    ui_dispatcher.post(scan_decoded, scan)
 
-def run_detection():
-    global processing, img_path, history
+def scan_decoded(scan):
+    global current_scan, draft_preview, detect_when_loaded
+    
+    # The user may have picked another file while this one was decoding
+    if scan.path != img_path:
+        return
+    
+    current_scan = scan
+    draft_preview = None
+    display_uploaded_image()
+    height, width = scan.shape
+    update_status(f"Loaded: {scan.name} ({width}x{height})")
     
-    if not img_path or processing:
+    if detect_when_loaded:
+        detect_when_loaded = False
+        run_detection()
+
+def scan_decode_failed(path, error):
+    global img_path, draft_preview, detect_when_loaded
+    if path != img_path:
         return
+    img_path = None
+    draft_preview = None
+    detect_when_loaded = False
+    upload_title.configure(text="Upload MRI Scan")
+    messagebox.showerror("Error", f"Failed to open image: {str(error)}")
+
+def run_detection(scan=None):
+    """Submit a scan (the one on screen by default); returns the Future of its record, or None"""
+    global pending_scans
     
-    processing = True
-    detect_button.configure(state="disabled")
-    upload_button.configure(state="disabled")
-    clear_button.configure(state="disabled")
-    save_button.configure(state="disabled")
+    scan = scan or current_scan
+    if scan is None or inference_pool is None:
+        return None
     
     start_time = time.time()
     
     try:
-        original_img = Image.open(img_path).resize((400, 400))
-        results = model(img_path)
+        # Results are keyed by decoded pixels, so renamed copies of a scan hit the cache too
+        tiled = settings["tiled"] and max(scan.shape) > settings["tile_size"]
+        params = {"conf": DETECTION_CONF, "imgsz": inference_pool.imgsz,
+                  "backend": inference_pool.backend, "precision": inference_pool.precision}
+        if tiled:
+            params.update(tile=settings["tile_size"], overlap=settings["tile_overlap"], merge=settings["tile_merge"])
+        
+        # Taken now, so a result still in flight during a model swap keeps the model that made it
+        model = model_info()
+        with tracer.stage("cache_lookup", scan=scan.trace_id):
+            cache_key = result_cache.key(scan.pixel_hash(), params)
+            cached = result_cache.get(cache_key)
+        
+        if cached is not None:
+            future = Future()
+            future.set_result(cached)
+        elif tiled:
+            submit_ns = time.perf_counter_ns()
+            with tracer.stage("submit_tiles", scan=scan.trace_id):
+                future = submit_tiled(inference_pool, scan.pixels, conf=DETECTION_CONF,
+                                      tile=settings["tile_size"], overlap=settings["tile_overlap"],
+                                      method=settings["tile_merge"])
+            future.add_done_callback(lambda f: trace_server_stages(f, scan, submit_ns))
+            future.add_done_callback(lambda f: store_cached_result(cache_key, f))
+        else:
+            # Progressive mode: a quick low-resolution pass is queued ahead of the full-size one
+            preview_imgsz = preview_size() if scan is current_scan else None
+            if preview_imgsz:
+                preview_input, preview_letterbox = scan.model_input(preview_imgsz)
+                preview_future = inference_pool.submit(preview_input, conf=DETECTION_CONF, imgsz=preview_imgsz,
+                                                       letterbox=preview_letterbox)
+            
+            # Only the letterboxed model input crosses into the inference server
+            with tracer.stage("letterbox", scan=scan.trace_id):
+                model_input, letterbox = scan.model_input(inference_pool.imgsz)
+            submit_ns = time.perf_counter_ns()
+            with tracer.stage("submit", scan=scan.trace_id):
+                future = inference_pool.submit(model_input, conf=DETECTION_CONF, letterbox=letterbox)
+            future.add_done_callback(lambda f: trace_server_stages(f, scan, submit_ns))
+            future.add_done_callback(lambda f: store_cached_result(cache_key, f))
+            
+            if preview_imgsz:
+                preview_future.add_done_callback(
+                    lambda f: ui_dispatcher.post(show_preview_result, f, future, scan, start_time, preview_imgsz)
+                )
+    except Exception as e:
+        print(f"Error during detection: {e}")
+        if scan is current_scan:
+            detect_title.configure(text="Detection Failed")
+        update_status(f"Error: {str(e)}")
+        return None
+    
+    pending_scans += 1
+    update_status(f"Processing {scan.name} ({pending_scans} in progress)")
+    
+    # The future completes on the pool's listener thread, finish on the Tk thread
+    future.add_done_callback(
+        lambda f: ui_dispatcher.post(finish_detection, f, scan, start_time, cached is not None, model)
+    )
+    return future
+
+def persist_settings():
+    """Save the settings file; a read-only location only costs the change on the next start"""
+    try:
+        save_settings(settings)
+    except OSError as e:
+        print(f"Could not save settings: {e}")
+
+def toggle_watch():
+    """Start or stop auto-ingesting scans from the watch folders (asks for one the first time)"""
+    if watch_ingest is not None:
+        stop_watching()
+        settings["watch_enabled"] = False
+    else:
+        if not settings["watch_dirs"]:
+            folder = filedialog.askdirectory(title="Select a folder to watch for new scans",
+                                             initialdir=os.path.expanduser("~"))
+            if not folder:
+                return
+            settings["watch_dirs"] = [folder]
+        settings["watch_enabled"] = True
+        start_watching()
+    persist_settings()
+
+def start_watching():
+    global watch_ingest
+    watch_ingest = WatchIngest(
+        settings["watch_dirs"],
+        submit=submit_watched_scan,
+        # Keep the pool busy without flooding it, leaving room for scans opened by hand
+        capacity=lambda: inference_pool.workers * 2 if inference_pool is not None and model_state == "ready" else 0,
+        on_status=lambda message: ui_dispatcher.post(update_status, message),
+        settle_seconds=settings["watch_settle_seconds"],
+        poll_seconds=settings["watch_poll_seconds"]
+    )
+    watch_ingest.start()
+    watch_button.configure(text="👁 Watching")
+
+def stop_watching():
+    global watch_ingest
+    if watch_ingest is not None:
+        watch_ingest.stop()
+        watch_ingest = None
+    watch_button.configure(text="👁 Watch")
+
+def start_http_service():
+    """Serve detections to other local tools from the pool this window already loaded"""
+    global http_service
+    try:
+        http_service = DetectionService(lambda: inference_pool, port=settings["http_port"],
+                                        max_concurrent=settings["http_max_concurrent"], conf=DETECTION_CONF)
+    except OSError as e:
+        print(f"Could not start the HTTP service on port {settings['http_port']}: {e}")
+        return
+    http_service.start()
+    print(f"Serving detections on {http_service.address}")
+
+def submit_watched_scan(path):
+    """Runs on the ingest thread: decode here, then submit on the Tk thread like a scan opened by hand"""
+    trace_id = tracer.new_scan()
+    with tracer.stage("decode", scan=trace_id):
+        scan = ScanImage(path)
+    scan.trace_id = trace_id
+    
+    done = Future()
+    
+    def submit():
+        future = run_detection(scan)
+        if future is None:
+            done.set_exception(RuntimeError(f"Could not submit {scan.name}"))
+            return
+        future.add_done_callback(
+            lambda f: done.set_exception(f.exception()) if f.exception() else done.set_result(f.result())
+        )
+    
+    ui_dispatcher.post(submit)
+    return done
+
+def toggle_tiled():
+    settings["tiled"] = bool(tiled_switch.get())
+    persist_settings()
+    update_status(f"Tiled detection {'on' if settings['tiled'] else 'off'} "
+                  f"({settings['tile_size']}px tiles, {settings['tile_overlap']:.0%} overlap)")
+
+def preview_size():
+    """Input size of the quick first pass, or None when progressive detection is off"""
+    size = int(settings.get("preview_imgsz") or 0) // 32 * 32
+    if not 32 <= size < inference_pool.imgsz:
+        return None
+    return size
+
+def show_preview_result(preview_future, future, scan, start_time, preview_imgsz):
+    """Show the low-resolution result until the full-size pass replaces it"""
+    if future.done() or scan is not current_scan or preview_future.exception() is not None:
+        return
+    record = preview_future.result()
+    
+    preview_img = overlay_renderer.render(scan.preview((400, 400)), record, current_theme)
+    if record["regions"] > 0:
+        detect_title.configure(text=f"Tumor Detected ({record['regions']} regions) - refining...")
+    else:
+        detect_title.configure(text="No Tumor Detected - refining...")
+    
+    preview_img_tk = ImageTk.PhotoImage(preview_img)
+    detect_label.config(image=preview_img_tk)
+    detect_label.image = preview_img_tk
+    update_status(f"Preview at {preview_imgsz}px in {time.time() - start_time:.2f}s, "
+                  f"refining at {inference_pool.imgsz}px...")
+
+def trace_server_stages(future, scan, submit_ns):
+    """Runs on the pool's listener thread when the server answers"""
+    if future.exception() is not None:
+        return
+    record = future.result()
+    stages = record.get("stages_ms", {})
+    round_trip_ms = (time.perf_counter_ns() - submit_ns) / 1e6
+    
+    tracer.add_remote_stages(stages, submit_ns, scan=scan.trace_id)
+    # Whatever the server did not account for was spent queued or crossing processes
+    tracer.add("queue_ipc", submit_ns, int(max(0.0, round_trip_ms - sum(stages.values())) * 1e6),
+               scan=scan.trace_id, track="inference server")
+
+def store_cached_result(cache_key, future):
+    """Runs on the pool's listener thread, so the disk write never touches the Tk thread"""
+    if future.exception() is None:
+        result_cache.put(cache_key, future.result())
+
+def finish_detection(future, scan, start_time, cache_hit=False, model=None):
+    global pending_scans, history, current_result, shown_entry
+    
+    pending_scans -= 1
+    is_current = scan is current_scan
+    
+    try:
+        # A copy, the cache holds the record the pool returned
+        record = dict(future.result(), model=model)
         
         detection_time = time.time() - start_time
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        annotate_ns = time.perf_counter_ns()
+        # Drawn at display size from the boxes; full resolution only happens on export
+        result_img = overlay_renderer.render(scan.preview((400, 400)), record, current_theme)
         
-        if results and len(results[0].boxes) > 0:
-            result_img = results[0].plot()
-            result_img = Image.fromarray(result_img[..., ::-1]).resize((400, 400))
-            result_img_tk = ImageTk.PhotoImage(result_img)
-            detect_title.configure(text=f"Tumor Detected ({len(results[0].boxes)} regions)")
+        if record["regions"] > 0:
+            if is_current:
+                detect_title.configure(text=f"Tumor Detected ({record['regions']} regions)")
             
             # Add to history
             history_entry = {
                 "timestamp": timestamp,
-                "filename": os.path.basename(img_path),
+                "filename": scan.name,
                 "result": "Positive",
-                "confidence": float(max([box.conf for box in results[0].boxes])),
+                "confidence": float(record["confidence"]),
                 "image": result_img,
-                "time_taken": detection_time
+                "time_taken": detection_time,
+                "path": scan.path,
+                "record": record
             }
             
-            update_status(f"Detection completed in {detection_time:.2f}s - Tumor found")
-            update_stats("positive")
+            update_status(f"Detection completed in {detection_time:.2f}s - Tumor found"
+                          f"{' (cached)' if cache_hit else ''} • {result_cache.stats_text()}")
         else:
-            # Add "No_Tumor" annotation to original image
-            result_img = add_no_tumor_detection(original_img)
-            result_img_tk = ImageTk.PhotoImage(result_img)
-            detect_title.configure(text="No Tumor Detected")
+            if is_current:
+                detect_title.configure(text="No Tumor Detected")
             
             # Add to history
             history_entry = {
                 "timestamp": timestamp,
-                "filename": os.path.basename(img_path),
+                "filename": scan.name,
                 "result": "Negative",
                 "confidence": 0.9,  # Default confidence for no tumor
                 "image": result_img,
-                "time_taken": detection_time
+                "time_taken": detection_time,
+                "path": scan.path,
+                "record": record
             }
             
-            update_status(f"Detection completed in {detection_time:.2f}s - No tumor")
-            update_stats("negative")
+            update_status(f"Detection completed in {detection_time:.2f}s - No tumor"
+                          f"{' (cached)' if cache_hit else ''} • {result_cache.stats_text()}")
         
-        history.append(history_entry)
-        update_history_list()
+        tracer.add("annotate", annotate_ns, time.perf_counter_ns() - annotate_ns, scan=scan.trace_id)
         
-        detect_label.config(image=result_img_tk)
-        detect_label.image = result_img_tk
+        with tracer.stage("history", scan=scan.trace_id):
+            history.append(history_entry)
+            detection_stats.add_entry(history_entry)
+        # Several results landing in the same frame rebuild the list only once
+        ui_dispatcher.post(update_history_list, key="history_list")
+        
+        # Only replace the result panel if the user is still looking at this scan
+        if is_current:
+            current_result = (scan, record)
+            shown_entry = None
+            with tracer.stage("photoimage", scan=scan.trace_id):
+                result_img_tk = result_photo(scan, record, result_img)
+                detect_label.config(image=result_img_tk)
+                detect_label.image = result_img_tk
+            update_timing_breakdown(scan)
             
     except Exception as e:
         print(f"Error during detection: {e}")
-        detect_title.configure(text="Detection Failed")
+        if is_current:
+            detect_title.configure(text="Detection Failed")
         update_status(f"Error: {str(e)}")
-        
-    finally:
-        processing = False
-        detect_button.configure(state="normal")
-        upload_button.configure(state="normal")
-        clear_button.configure(state="normal")
-        save_button.configure(state="normal")
 
 def detect_disease():
-    if not img_path:
+    global detect_when_loaded
+    
+    if not img_path and current_volume is None:
         messagebox.showwarning("No Image", "Please upload an image first!")
         return
+    if model_state != "ready":
+        messagebox.showinfo("Model Not Ready", f"The detection model is still {model_state}, please wait.")
+        return
     
     detect_title.configure(text="Processing...")
-    window.update()
+    if current_volume is not None:
+        run_volume_detection()
+    elif current_scan is None:
+        # Still decoding the full-resolution scan; start as soon as it is ready
+        detect_when_loaded = True
+    else:
+        run_detection()
+
+def open_volume_dialog():
+    """Open a DICOM series, multi-frame DICOM, NIfTI or NumPy volume for slice-by-slice screening"""
+    global img_path, current_scan, current_volume, volume_results, shown_entry
+    
+    path = filedialog.askopenfilename(
+        title="Select MRI Volume (any slice of a DICOM series, .nii/.nii.gz or .npy)",
+        filetypes=[("Volumes", "*.dcm;*.nii;*.nii.gz;*.npy"), ("All Files", "*.*")],
+        initialdir=os.path.expanduser("~")
+    )
+    if not path:
+        return
+    
+    try:
+        volume = open_volume(path)
+    except Exception as e:
+        messagebox.showerror("Error", f"Failed to open volume: {str(e)}")
+        return
+    
+    img_path = None
+    current_scan = None
+    shown_entry = None
+    current_volume = volume
+    volume_results = {}
+    
+    slice_slider.configure(from_=0, to=max(1, len(volume) - 1), number_of_steps=max(1, len(volume) - 1))
+    slice_slider.set(0)
+    slice_frame.pack(fill="x", padx=25, pady=(5, 0))
+    show_volume_slice(0)
+    update_status(f"Loaded volume {volume.name} ({len(volume)} slices)")
+
+def close_volume():
+    global current_volume, volume_results
+    current_volume = None
+    volume_results = {}
+    slice_frame.pack_forget()
+
+def on_slice_scrub(value):
+    show_volume_slice(int(round(value)))
+
+def show_volume_slice(index):
+    if current_volume is None:
+        return
+    
+    index = max(0, min(index, len(current_volume) - 1))
+    slice_img = to_pil(current_volume.get_slice(index)).convert("RGB").resize((400, 400))
+    slice_tk = ImageTk.PhotoImage(slice_img)
+    upload_label.config(image=slice_tk)
+    upload_label.image = slice_tk
+    upload_title.configure(text=f"{current_volume.name[:20]} - slice {index + 1}")
+    slice_label.configure(text=f"Slice {index + 1}/{len(current_volume)}")
+    
+    if index in volume_results:
+        record = volume_results[index]
+        result_img = overlay_renderer.render(slice_img, record, current_theme)
+        if record["regions"] > 0:
+            detect_title.configure(text=f"Slice {index + 1}: Tumor Detected ({record['regions']} regions)")
+        else:
+            detect_title.configure(text=f"Slice {index + 1}: No Tumor Detected")
+    else:
+        result_img = Image.new("RGB", (400, 400), color=current_theme["image_bg"])
+        detect_title.configure(text=f"Slice {index + 1}: Detection Result (Pending)")
+    
+    result_tk = ImageTk.PhotoImage(result_img)
+    detect_label.config(image=result_tk)
+    detect_label.image = result_tk
+
+def run_volume_detection():
+    """Stream slices through batched inference with a bounded number of batches in flight"""
+    volume = current_volume
+    start_time = time.time()
+    model = model_info()
+    max_in_flight = inference_pool.workers * 2
+    
+    def feed():
+        in_flight = threading.Semaphore(max_in_flight)
+        
+        def on_done(future, indices):
+            in_flight.release()
+            ui_dispatcher.post(finish_volume_batch, volume, future, indices)
+        
+        try:
+            for indices, sources in iter_slice_batches(volume, VOLUME_BATCH_SIZE):
+                if current_volume is not volume:
+                    break
+                in_flight.acquire()
+                try:
+                    future = inference_pool.submit_batch(sources, conf=DETECTION_CONF)
+                except Exception:
+                    in_flight.release()
+                    raise
+                future.add_done_callback(lambda f, idx=indices: on_done(f, idx))
+        except Exception as e:
+            print(f"Error during volume detection: {e}")
+            update_status(f"Error: {str(e)}")
+        
+        # Wait for the last batches before summarising
+        for _ in range(max_in_flight):
+            in_flight.acquire()
+        ui_dispatcher.post(finish_volume_detection, volume, start_time, model)
+    
+    update_status(f"Screening {volume.name}: 0/{len(volume)} slices")
+    feeder_thread = threading.Thread(target=feed)
+    feeder_thread.daemon = True
+    feeder_thread.start()
+
+def finish_volume_batch(volume, future, indices):
+    if volume is not current_volume:
+        return
+    try:
+        for index, result in zip(indices, future.result()):
+            volume_results[index] = result
+    except Exception as e:
+        update_status(f"Error: {str(e)}")
+        return
+    
+    positive = sum(1 for record in volume_results.values() if record["regions"] > 0)
+    update_status(f"Screening {volume.name}: {len(volume_results)}/{len(volume)} slices, {positive} positive")
+    
+    shown = int(round(slice_slider.get()))
+    if shown in indices:
+        show_volume_slice(shown)
+
+def finish_volume_detection(volume, start_time, model=None):
+    if volume is not current_volume or not volume_results:
+        return
+    
+    detection_time = time.time() - start_time
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    positive = [i for i, record in volume_results.items() if record["regions"] > 0]
+    
+    # The history keeps one entry per volume, showing its most confident slice
+    if positive:
+        best = max(positive, key=lambda i: volume_results[i]["confidence"])
+        record = volume_results[best]
+        slice_img = to_pil(volume.get_slice(best)).convert("RGB").resize((400, 400))
+        history_entry = {
+            "timestamp": timestamp,
+            "filename": f"{volume.name} [slice {best + 1}]",
+            "result": "Positive",
+            "confidence": float(record["confidence"]),
+            "image": overlay_renderer.render(slice_img, record, current_theme),
+            "time_taken": detection_time,
+            "volume": volume.path,
+            "record": dict(record, model=model)
+        }
+        slice_slider.set(best)
+        show_volume_slice(best)
+        detect_title.configure(text=f"Tumor Detected in {len(positive)}/{len(volume)} slices")
+    else:
+        slice_img = to_pil(volume.get_slice(0)).convert("RGB").resize((400, 400))
+        history_entry = {
+            "timestamp": timestamp,
+            "filename": volume.name,
+            "result": "Negative",
+            "confidence": 0.9,  # Default confidence for no tumor
+            "image": overlay_renderer.render_negative(slice_img, current_theme),
+            "time_taken": detection_time,
+            "volume": volume.path,
+            "model": model
+        }
+        detect_title.configure(text=f"No Tumor Detected ({len(volume)} slices)")
+    
+    history.append(history_entry)
+    detection_stats.add_entry(history_entry)
+    ui_dispatcher.post(update_history_list, key="history_list")
+    rate = len(volume_results) / detection_time if detection_time > 0 else 0.0
+    update_status(f"Volume screened in {detection_time:.2f}s ({rate:.1f} slices/s) - "
+                  f"{len(positive)} positive slices")
+
+def start_inference_pool():
+    """Start the inference server for the selected model and backend.
+
+    The first pool is used straight away. A replacement (model or backend switch) loads
+    in the background while the current pool keeps serving, and takes over once ready.
+    """
+    global inference_pool, loading_pool
+    
+    state_messages = {
+        "loading": "Loading detection model...",
+        "warming": "Warming up detection model...",
+        "failed": "Error: detection model failed to load",
+        "stopped": "Detection model stopped",
+    }
+    
+    def set_model_state(pool, state):
+        global model_state, loading_pool
+        if pool is loading_pool:
+            if state == "ready":
+                swap_inference_pool(pool, model_name)
+            elif state in ("failed", "stopped"):
+                loading_pool = None
+                update_status(f"Error: {model_name} failed to load, still using {active_model}")
+                revert_model_selection()
+                threading.Thread(target=pool.shutdown, daemon=True).start()
+            else:
+                update_status(f"{state_messages.get(state, state)} ({model_name}, {active_model} stays active)")
+            return
+        # Ignore late messages from a pool that was replaced
+        if pool is not inference_pool:
+            return
+        model_state = state
+        detect_button.configure(state="normal" if state == "ready" else "disabled")
+        if state == "ready":
+            precision = "" if pool.precision == "fp32" else f" {PRECISIONS[pool.precision]}"
+            update_status(f"Model ready on {BACKENDS[pool.backend]}{precision} "
+                          f"({pool.ready_workers}/{pool.workers} workers)")
+        else:
+            update_status(state_messages.get(state, state))
+    
+    # Reduced precision is chosen in the settings file and applies from startup
+    precision = settings["precision"]
+    try:
+        check_precision(settings["backend"], precision)
+    except ValueError as e:
+        print(f"{e}; running in FP32")
+        precision = "fp32"
+    
+    # ultralytics needs input sizes that are a multiple of the model stride
+    imgsz = max(32, int(settings["imgsz"]) // 32 * 32)
+    model_name = settings["model"]
+    pool = InferencePool(model_registry.weights(model_name), imgsz=imgsz, backend=settings["backend"], precision=precision,
+                         calibration=settings["calibration_dir"], max_batch=settings["max_batch"],
+                         max_batch_delay_ms=settings["batch_delay_ms"])
+    # on_state is called from the pool's listener thread; two pools may report at once
+    pool.on_state = lambda state: ui_dispatcher.post(set_model_state, pool, state, key=("model_state", id(pool)))
+    
+    if loading_pool is not None:
+        # Superseded by a newer selection before it finished loading
+        threading.Thread(target=loading_pool.shutdown, daemon=True).start()
+        loading_pool = None
+    if inference_pool is not None and model_state == "ready":
+        loading_pool = pool
+    else:
+        # Nothing usable to keep serving with, replace the current pool outright
+        if inference_pool is not None:
+            threading.Thread(target=inference_pool.shutdown, daemon=True).start()
+        inference_pool = pool
+        swap_result_cache(model_name)
+    pool.start()
+
+def swap_result_cache(model_name):
+    global active_model, result_cache
+    active_model = model_name
+    result_cache = ResultCache(model_registry.weights(model_name))
+
+def swap_inference_pool(pool, model_name):
+    """Make a pool that finished loading the active one and unload the one it replaces"""
+    global inference_pool, loading_pool, model_state
+    old_pool = inference_pool
+    # New scans go to the new pool from here on; scans already sent finish on the old one
+    inference_pool, loading_pool = pool, None
+    swap_result_cache(model_name)
+    model_state = "ready"
+    detect_button.configure(state="normal")
+    precision = "" if pool.precision == "fp32" else f" {PRECISIONS[pool.precision]}"
+    update_status(f"Switched to {model_name} on {BACKENDS[pool.backend]}{precision} "
+                  f"({pool.ready_workers}/{pool.workers} workers)")
+    if old_pool is not None:
+        threading.Thread(target=retire_pool, args=(old_pool,), daemon=True).start()
+
+def retire_pool(pool, timeout=60):
+    """Let a replaced pool finish the scans already sent to it, then stop its server to free the model"""
+    deadline = time.monotonic() + timeout
+    while pool.pending_count() and time.monotonic() < deadline:
+        time.sleep(0.1)
+    pool.shutdown()
+
+def revert_model_selection():
+    """Point the header menus and settings back at the pool that is still serving"""
+    settings["model"] = active_model
+    model_menu.set(active_model)
+    if inference_pool is not None:
+        settings["backend"] = inference_pool.backend
+        backend_menu.set(BACKENDS[inference_pool.backend])
+    persist_settings()
+
+def select_model(choice, reload=False):
+    """Switch model versions from the header menu without restarting; reload re-reads changed weights"""
+    if choice == ADD_MODEL:
+        add_model()
+        return
+    if choice == settings["model"] and not reload:
+        return
+    settings["model"] = choice
+    persist_settings()
+    update_status(f"Loading {choice} in the background...")
+    start_inference_pool()
+
+def add_model():
+    """Register another weights file under a name and switch to it"""
+    model_menu.set(settings["model"])
+    path = filedialog.askopenfilename(
+        title="Select model weights",
+        filetypes=[("Model weights", "*.pt *.onnx"), ("All files", "*.*")]
+    )
+    if not path:
+        return
+    default_name = os.path.splitext(os.path.basename(path))[0]
+    name = ctk.CTkInputDialog(text=f"Name for this model version (default: {default_name}):",
+                              title="Add model").get_input()
+    if name is None:
+        return
+    name = name.strip() or default_name
+    try:
+        model_registry.add(name, path)
+    except (OSError, ValueError) as e:
+        messagebox.showerror("Add Model", str(e))
+        return
+    model_menu.configure(values=model_registry.names() + [ADD_MODEL])
+    model_menu.set(name)
+    # Re-registering a name with other weights has to load them even if it is already selected
+    select_model(name, reload=True)
+
+def select_backend(label):
+    """Switch the inference engine from the header menu and remember the choice"""
+    backend = next(name for name, title in BACKENDS.items() if title == label)
+    if backend == settings["backend"]:
+        return
+    settings["backend"] = backend
+    persist_settings()
     
-    detection_thread = threading.Thread(target=run_detection)
-    detection_thread.daemon = True
-    detection_thread.start()
+    start_inference_pool()
+
+def update_timing_breakdown(scan):
+    if show_timings and scan is not None:
+        text = tracer.breakdown_text(scan.trace_id)
+        if inference_pool is not None and inference_pool.max_batch > 1:
+            text += " • " + inference_pool.batch_stats.text()
+        timing_label.configure(text=text)
+
+def toggle_timings():
+    global show_timings
+    show_timings = not show_timings
+    if show_timings:
+        update_timing_breakdown(current_scan)
+    else:
+        timing_label.configure(text="")
+
+def on_close():
+    stop_watching()
+    if http_service is not None:
+        http_service.stop()
+    ui_dispatcher.stop()
+    trace_file = tracer.write_chrome_trace()
+    if trace_file:
+        print(f"Trace written to {trace_file}")
+    if loading_pool is not None:
+        loading_pool.shutdown()
+    if inference_pool is not None:
+        inference_pool.shutdown()
+    result_exporter.shutdown(wait=True)
+    history.close()
+    window.destroy()
 
 def clear_images():
-    global img_path
+    global img_path, current_scan, draft_preview, detect_when_loaded, shown_entry
+    shown_entry = None
     img_path = None
+    current_scan = None
+    draft_preview = None
+    detect_when_loaded = False
+    close_volume()
     
     # Clear uploaded image
     blank_img = Image.new("RGB", (400, 400), color=current_theme["image_bg"])
@@ -372,97 +1018,166 @@ def clear_images():
     detect_title.configure(text="Detection Result")
     update_status("Ready")
 
+def model_info():
+    """Details of the active model, stored with each result at submission for export sidecars"""
+    info = {"model": active_model, "weights": os.path.basename(result_cache.weights_path),
+            "weights_hash": result_cache.weights_hash(), "conf": DETECTION_CONF}
+    if inference_pool is not None:
+        info.update(backend=inference_pool.backend, precision=inference_pool.precision, imgsz=inference_pool.imgsz)
+    return info
+
 def save_results():
-    if not img_path or not hasattr(detect_label, 'image'):
+    """Export the result on screen: the current scan's detection or the history entry that was clicked"""
+    # Only a snapshot is taken here; rendering, encoding and writing happen on the export pool
+    theme = dict(current_theme)
+    if shown_entry is not None:
+        entry = shown_entry
+        source = entry.get("path") or entry.get("volume")
+        record = entry.get("record") or {"result": entry["result"], "confidence": entry["confidence"],
+                                         "model": entry.get("model")}
+        render = lambda: render_history_entry(entry, theme)
+        timings = None
+    elif current_result is not None and current_result[0] is current_scan:
+        # Re-draw the overlay on the full-resolution scan instead of saving the 400px preview
+        scan, record = current_result
+        source = scan.path
+        render = lambda: render_full(scan.pixels, record, theme)
+        timings = tracer.breakdown(scan.trace_id)
+    else:
         messagebox.showwarning("No Results", "Nothing to save. Please process an image first.")
         return
     
-    # Create output directory if it doesn't exist
-    output_dir = "NeuroVision_Results"
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-    
     # Generate filename with timestamp
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    base_filename = os.path.splitext(os.path.basename(img_path))[0]
-    output_filename = f"{output_dir}/{base_filename}_result_{timestamp}.png"
+    base_filename = os.path.splitext(os.path.basename(source))[0]
+    stem = f"{base_filename}_result_{timestamp}"
     
+    # The sidecar's model details come from the record, i.e. the model that produced it
+    future = result_exporter.export(render, record, settings["export_dir"], stem,
+                                    source=source, timings=timings)
+    future.add_done_callback(lambda f: ui_dispatcher.post(export_finished, f))
+    update_status(f"Saving {stem}...")
+
+def export_finished(future, description=None):
     try:
-        # Get the detection image from the label
-        img = ImageTk.getimage(detect_label.image)
-        img.save(output_filename)
-        update_status(f"Results saved to {output_filename}")
-        messagebox.showinfo("Success", f"Results saved successfully to:\n{output_filename}")
+        result = future.result()
     except Exception as e:
         messagebox.showerror("Error", f"Failed to save results: {str(e)}")
+        return
+    update_status(f"Results saved to {description or result}")
+
+def render_history_entry(entry, theme):
+    """Full-resolution overlay of a history entry, or its stored result image (runs on the export pool)"""
+    # Single scans that are still on disk are re-rendered at full resolution
+    record, path = entry.get("record"), entry.get("path")
+    if record is not None and path and os.path.exists(path):
+        try:
+            return render_full(decode_scan(path), record, theme)
+        except Exception:
+            pass
+    return history.get_image(entry)
+
+def save_all_history():
+    """Export every history entry with its sidecar to a folder, or to a zip when the name ends in .zip"""
+    if not len(history):
+        messagebox.showwarning("No Results", "The history is empty.")
+        return
+    
+    destination = filedialog.asksaveasfilename(
+        title="Export History (.zip archive, or a name without extension for a folder)",
+        initialdir=os.path.abspath(settings["export_dir"]),
+        initialfile=f"NeuroVision_History_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
+        filetypes=[("Zip archive", "*.zip"), ("Folder", "*")]
+    )
+    if not destination:
+        return
+    
+    theme = dict(current_theme)
+    entries = list(history)
+    total = len(entries)
+    
+    def items():
+        # A generator, so the export thread renders and writes one entry at a time
+        for number, entry in enumerate(entries, 1):
+            name = os.path.splitext(os.path.basename(entry["filename"]))[0]
+            stem = f"{number:04d}_{''.join(c if c.isalnum() or c in '-_' else '_' for c in name)}"
+            record = entry.get("record") or {"result": entry["result"], "confidence": entry["confidence"],
+                                             "model": entry.get("model")}
+            yield stem, (lambda e=entry: render_history_entry(e, theme)), record, entry.get("path") or entry.get("volume")
+    
+    future = result_exporter.export_many(
+        items(), destination,
+        on_progress=lambda done: update_status(f"Exporting history: {done}/{total}")
+    )
+    future.add_done_callback(lambda f: ui_dispatcher.post(export_finished, f, f"{destination} ({total} results)"))
+
+def select_export_format(label):
+    fmt = label.lower()
+    result_exporter.configure(fmt=fmt)
+    settings["export_format"] = fmt
+    persist_settings()
 
 def update_status(message):
+    """Safe to call from any thread; only the latest message per frame is drawn"""
+    ui_dispatcher.post(set_status_text, message, key="status")
+
+def set_status_text(message):
     status_label.configure(text=f"Status: {message}")
-    window.update()
 
 def update_stats(result_type):
-    global stats_positive, stats_negative, stats_total
-    
-    total = len(history)
-    positive = len([h for h in history if h["result"] == "Positive"])
-    negative = total - positive
-    
-    stats_positive.configure(text=f"Positive: {positive}")
-    stats_negative.configure(text=f"Negative: {negative}")
-    stats_total.configure(text=f"Total Scans: {total}")
+    # Running counters, no pass over the history
+    stats_positive.configure(text=f"Positive: {detection_stats.positive}")
+    stats_negative.configure(text=f"Negative: {detection_stats.negative}")
+    stats_total.configure(text=f"Total Scans: {detection_stats.total}")
+    stats_latency.configure(text=detection_stats.latency_text())
+    stats_throughput.configure(text=f"Throughput: {detection_stats.throughput_per_minute():.1f} scans/min")
+    stats_confidence.configure(text=f"Confidence 0-100%: {detection_stats.confidence_sparkline() or '-'}")
+
+def refresh_stats_periodically():
+    # Throughput is a sliding window, so it changes even when no scan finishes
+    update_stats(None)
+    window.after(5000, refresh_stats_periodically)
 
 def update_history_list():
-    global history_buttons
-    
-    # Clear existing buttons
-    for widget in history_scroll_frame.winfo_children():
-        widget.destroy()
-    
-    history_buttons = []
-    
-    # Add newest first
-    for i, entry in enumerate(reversed(history)):
-        btn_text = f"{entry['timestamp']} - {entry['filename'][:15]}... ({entry['result']})"
-        btn = ctk.CTkButton(
-            history_scroll_frame,
-            text=btn_text,
-            command=lambda e=entry: show_history_entry(e),
-            font=("Roboto", 10),
-            fg_color=current_theme["button_primary"],
-            hover_color=adjust_color(current_theme["button_primary"], -20),
-            anchor="w",
-            height=30
-        )
-        btn.pack(fill="x", pady=2)
-        history_buttons.append(btn)
+    # Newest first; only the rows in view are relabelled
+    history_list.refresh()
     
     # Update stats
     update_stats(None)
 
 def show_history_entry(entry):
-    global img_path
+    global current_result, shown_entry
+    # Save Results now exports this entry rather than the scan loaded for detection
+    current_result = None
+    shown_entry = entry
+    
+    status = f"Showing history entry from {entry['timestamp']}"
     
     # Display the original image
     try:
-        img = Image.open(entry["filename"]) if os.path.exists(entry["filename"]) else entry["image"]
+        # The scan itself while it is still on disk, otherwise the full-size result image
+        path = entry.get("path")
+        img = open_scan_image(path) if path and os.path.exists(path) else history.get_image(entry)
         img = img.resize((400, 400))
         img_tk = ImageTk.PhotoImage(img)
         
         upload_label.config(image=img_tk)
         upload_label.image = img_tk
         upload_title.configure(text=f"History: {entry['filename'][:20]}...")
-    except:
-        pass
+    except (OSError, ValueError, RuntimeError) as e:
+        # Unreadable or changed scan (RuntimeError: DICOM without pydicom); the result still shows
+        status += f" (could not load the scan: {e})"
     
     # Display the result image
-    result_img = entry["image"].resize((400, 400))
+    # Full-resolution results are reloaded from the history disk cache if they were evicted
+    result_img = history.get_image(entry).resize((400, 400))
     result_img_tk = ImageTk.PhotoImage(result_img)
     
     detect_label.config(image=result_img_tk)
     detect_label.image = result_img_tk
     detect_title.configure(text=f"Result: {entry['result']} ({entry['confidence']*100:.1f}%)")
     
-    update_status(f"Showing history entry from {entry['timestamp']}")
+    update_status(status)
 
 def open_help():
     help_text = """
@@ -472,7 +1187,8 @@ def open_help():
     1. Click 'Upload MRI Scan' to select a brain MRI image
     2. Click 'Detect Tumor' to analyze the image
     3. View results in the right panel
-    4. Use 'Save Results' to save the detection image
+    4. Use 'Save Results' to save the detection image at full resolution
+       (with a .json file of the detections), or 'Save All' for the whole history
     5. Access previous scans in the History section
     
     Tips:
@@ -549,6 +1265,30 @@ help_button = ctk.CTkButton(
 )
 help_button.pack(side="right", padx=5)
 
+timings_button = ctk.CTkButton(
+    button_container,
+    text="⏱ Timings",
+    command=toggle_timings,
+    font=("Roboto", 12),
+    width=90,
+    height=30,
+    fg_color=LIGHT_THEME["header"],
+    hover_color=adjust_color(LIGHT_THEME["header"], 20)
+)
+timings_button.pack(side="right", padx=5)
+
+watch_button = ctk.CTkButton(
+    button_container,
+    text="👁 Watch",
+    command=toggle_watch,
+    font=("Roboto", 12),
+    width=100,
+    height=30,
+    fg_color=LIGHT_THEME["header"],
+    hover_color=adjust_color(LIGHT_THEME["header"], 20)
+)
+watch_button.pack(side="right", padx=5)
+
 theme_button = ctk.CTkButton(
     button_container,
     text="🎨 Theme",
@@ -569,6 +1309,32 @@ theme_preview = ctk.CTkLabel(
 )
 theme_preview.pack(side="right", padx=10)
 
+backend_menu = ctk.CTkOptionMenu(
+    button_container,
+    values=list(BACKENDS.values()),
+    command=select_backend,
+    font=("Roboto", 12),
+    width=140,
+    height=30,
+    fg_color=LIGHT_THEME["button_primary"],
+    button_color=adjust_color(LIGHT_THEME["button_primary"], -20)
+)
+backend_menu.set(BACKENDS.get(settings["backend"], BACKENDS["pytorch"]))
+backend_menu.pack(side="right", padx=5)
+
+model_menu = ctk.CTkOptionMenu(
+    button_container,
+    values=model_registry.names() + [ADD_MODEL],
+    command=select_model,
+    font=("Roboto", 12),
+    width=140,
+    height=30,
+    fg_color=LIGHT_THEME["button_primary"],
+    button_color=adjust_color(LIGHT_THEME["button_primary"], -20)
+)
+model_menu.set(active_model)
+model_menu.pack(side="right", padx=5)
+
 # Main content area
 main_frame = ctk.CTkFrame(window, fg_color="transparent")
 main_frame.pack(expand=True, fill="both", padx=20, pady=10)
@@ -585,7 +1351,7 @@ image_frame.pack(expand=True, fill="both")
 upload_frame = ctk.CTkFrame(
     image_frame, 
     width=450, 
-    height=460,
+    height=490,
     fg_color=LIGHT_THEME["card"],
     border_width=1,
     border_color=LIGHT_THEME["card_border"],
@@ -626,7 +1392,7 @@ upload_label.pack(expand=True, fill="both", padx=5, pady=5)
 detect_frame = ctk.CTkFrame(
     image_frame, 
     width=450, 
-    height=460,
+    height=490,
     fg_color=LIGHT_THEME["card"],
     border_width=1,
     border_color=LIGHT_THEME["card_border"],
@@ -663,6 +1429,26 @@ detect_label = Label(
 )
 detect_label.pack(expand=True, fill="both", padx=5, pady=5)
 
+# Slice scrubber, only shown in volume mode
+slice_frame = ctk.CTkFrame(detect_frame, fg_color="transparent")
+
+slice_label = ctk.CTkLabel(
+    slice_frame,
+    text="Slice 1/1",
+    font=("Roboto", 11),
+    text_color=LIGHT_THEME["text_secondary"],
+    width=80
+)
+slice_label.pack(side="left")
+
+slice_slider = ctk.CTkSlider(
+    slice_frame,
+    from_=0,
+    to=1,
+    command=on_slice_scrub
+)
+slice_slider.pack(side="left", fill="x", expand=True, padx=(5, 0))
+
 # Action buttons
 button_frame = ctk.CTkFrame(left_panel, fg_color="transparent")
 button_frame.pack(pady=10)
@@ -727,6 +1513,60 @@ save_button = ctk.CTkButton(
 )
 save_button.grid(row=0, column=3, padx=10, pady=5)
 
+volume_button = ctk.CTkButton(
+    button_frame,
+    text="🧠 Open Volume",
+    command=open_volume_dialog,
+    font=("Roboto", 14, "bold"),
+    fg_color=LIGHT_THEME["button_primary"],
+    hover_color=adjust_color(LIGHT_THEME["button_primary"], -20),
+    text_color="white",
+    corner_radius=8,
+    width=180,
+    height=40,
+    border_spacing=8
+)
+volume_button.grid(row=1, column=0, padx=10, pady=5)
+
+tiled_switch = ctk.CTkSwitch(
+    button_frame,
+    text="🔲 Tiled (small lesions)",
+    command=toggle_tiled,
+    font=("Roboto", 12),
+    progress_color=LIGHT_THEME["button_primary"]
+)
+if settings["tiled"]:
+    tiled_switch.select()
+tiled_switch.grid(row=1, column=1, padx=10, pady=5, sticky="w")
+
+export_format_menu = ctk.CTkOptionMenu(
+    button_frame,
+    values=[fmt.upper() for fmt in EXPORT_FORMATS],
+    command=select_export_format,
+    font=("Roboto", 12),
+    width=100,
+    height=30,
+    fg_color=LIGHT_THEME["accent"],
+    button_color=adjust_color(LIGHT_THEME["accent"], -20)
+)
+export_format_menu.set(settings["export_format"].upper())
+export_format_menu.grid(row=1, column=2, padx=10, pady=5)
+
+save_all_button = ctk.CTkButton(
+    button_frame,
+    text="🗂 Save All",
+    command=save_all_history,
+    font=("Roboto", 14, "bold"),
+    fg_color=LIGHT_THEME["accent"],
+    hover_color=adjust_color(LIGHT_THEME["accent"], -20),
+    text_color="white",
+    corner_radius=8,
+    width=150,
+    height=40,
+    border_spacing=8
+)
+save_all_button.grid(row=1, column=3, padx=10, pady=5)
+
 # Right panel (history and stats)
 right_panel = ctk.CTkFrame(main_frame, fg_color="transparent", width=300)
 right_panel.pack(side="right", fill="y", padx=10)
@@ -752,23 +1592,27 @@ history_title = ctk.CTkLabel(
 )
 history_title.pack(pady=(15, 10))
 
-# Scrollable history list
-history_scroll = ctk.CTkScrollableFrame(
-    history_frame, 
-    fg_color="transparent"
+def history_button_style(theme):
+    return {
+        "fg_color": theme["button_primary"],
+        "hover_color": adjust_color(theme["button_primary"], -20),
+    }
+
+# Scrollable history list, virtualized so it stays fast with thousands of entries
+history_list = VirtualHistoryList(
+    history_frame,
+    history=history,
+    on_select=show_history_entry,
+    theme=LIGHT_THEME,
+    button_style=history_button_style
 )
-history_scroll.pack(expand=True, fill="both", padx=10, pady=5)
-
-history_scroll_frame = ctk.CTkFrame(history_scroll, fg_color="transparent")
-history_scroll_frame.pack(fill="both", expand=True)
-
-history_buttons = []
+history_list.pack(expand=True, fill="both", padx=10, pady=5)
 
 # Statistics section
 stats_frame = ctk.CTkFrame(
     right_panel, 
     width=300,
-    height=200,
+    height=280,
     fg_color=LIGHT_THEME["card"],
     border_width=1,
     border_color=LIGHT_THEME["card_border"],
@@ -812,6 +1656,30 @@ stats_total = ctk.CTkLabel(
 )
 stats_total.pack(anchor="w", pady=5)
 
+stats_latency = ctk.CTkLabel(
+    stats_content,
+    text="Latency: -",
+    font=("Roboto", 12),
+    text_color=LIGHT_THEME["text_secondary"]
+)
+stats_latency.pack(anchor="w", pady=2)
+
+stats_throughput = ctk.CTkLabel(
+    stats_content,
+    text="Throughput: 0.0 scans/min",
+    font=("Roboto", 12),
+    text_color=LIGHT_THEME["text_secondary"]
+)
+stats_throughput.pack(anchor="w", pady=2)
+
+stats_confidence = ctk.CTkLabel(
+    stats_content,
+    text="Confidence 0-100%: -",
+    font=("Roboto", 12),
+    text_color=LIGHT_THEME["text_secondary"]
+)
+stats_confidence.pack(anchor="w", pady=2)
+
 # Status bar
 status_bar = ctk.CTkFrame(
     window, 
@@ -829,6 +1697,15 @@ status_label = ctk.CTkLabel(
 )
 status_label.pack(side="left", padx=20)
 
+# Per-stage timing breakdown of the last scan, toggled from the header
+timing_label = ctk.CTkLabel(
+    status_bar,
+    text="",
+    font=("Roboto", 10),
+    text_color=LIGHT_THEME["status_text"]
+)
+timing_label.pack(side="right", padx=20)
+
 # Initialize with blank images
 blank_img = Image.new("RGB", (400, 400), color=LIGHT_THEME["image_bg"])
 blank_tk = ImageTk.PhotoImage(blank_img)
@@ -841,4 +1718,17 @@ detect_label.image = blank_tk
 # Apply theme
 apply_theme()
 
+# UI updates from worker threads are drained here on the Tk thread
+ui_dispatcher = UIDispatcher(window)
+ui_dispatcher.start()
+refresh_stats_periodically()
+
+# Show the window first, then load the model behind it
+window.protocol("WM_DELETE_WINDOW", on_close)
+window.after(100, start_inference_pool)
+if settings["watch_enabled"] and settings["watch_dirs"]:
+    start_watching()
+if settings["http_port"]:
+    start_http_service()
+
 window.mainloop()
\ No newline at end of file
@@ -0,0 +1,371 @@
+"""
+NeuroVision AI - inference backends
+
+The same YOLOv8 detection API can run on PyTorch or on an exported graph
+(ONNX Runtime or OpenVINO), which is usually much faster on CPU-only
+workstations. Exports are produced once with ultralytics and cached next to
+the .pt weights; they are rebuilt when the weights are newer than the export.
+
+Reduced precision is optional: "bf16" runs the PyTorch forward pass under
+bfloat16 autocast (only faster on CPUs with native bf16 support), the "int8"
+modes quantize the ONNX export with ONNX Runtime, either dynamically or
+statically using activation ranges calibrated on a folder of local scans.
+Building an INT8 model writes an accuracy/latency report against FP32 next to
+it when a calibration folder is available.
+
+Check that an exported backend agrees with PyTorch on a folder of scans:
+    python backends.py --weights best.pt --backend onnx scans/
+    python backends.py --backend onnx --precision int8-static --calibration calib/ scans/
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+BACKENDS = {
+    "pytorch": "PyTorch",
+    "onnx": "ONNX Runtime",
+    "openvino": "OpenVINO",
+}
+
+PRECISIONS = {
+    "fp32": "FP32",
+    "bf16": "bfloat16",
+    "int8-dynamic": "INT8 (dynamic)",
+    "int8-static": "INT8 (static)",
+}
+
+DEFAULT_BACKEND = os.environ.get("NEUROVISION_BACKEND", "pytorch")
+DEFAULT_PRECISION = os.environ.get("NEUROVISION_PRECISION", "fp32")
+# Folder of representative scans for static INT8 calibration and the accuracy report
+DEFAULT_CALIBRATION = os.environ.get("NEUROVISION_CALIBRATION")
+
+
+def export_path(weights, backend):
+    """Where the exported model for these weights is cached; one export serves every input size"""
+    stem = os.path.splitext(weights)[0]
+    if backend == "onnx":
+        return stem + ".onnx"
+    if backend == "openvino":
+        return stem + "_openvino_model"
+    return weights
+
+
+def ensure_exported(weights, backend, imgsz=640):
+    """Export the weights for backend unless an up-to-date export is already cached"""
+    if backend == "pytorch" or not weights.lower().endswith(".pt"):
+        # Nothing to export, or the path already points at an exported model
+        return weights
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+
+    target = export_path(weights, backend)
+    if _is_current(target, weights):
+        return target
+
+    # Dynamic axes let batched jobs (volume slices, tiles, micro-batches) and the
+    # preview pass run at any batch size and resolution; imgsz is only the trace size
+    from ultralytics import YOLO
+    return str(YOLO(weights).export(format=backend, imgsz=imgsz, dynamic=True) or target)
+
+
+def has_dynamic_batch(path):
+    """Whether an ONNX/OpenVINO export accepts any batch size"""
+    try:
+        if path.lower().endswith(".onnx"):
+            import onnx
+            model = onnx.load(path, load_external_data=False)
+            dim = model.graph.input[0].type.tensor_type.shape.dim[0]
+            return bool(dim.dim_param) or dim.dim_value <= 0
+        with open(glob.glob(os.path.join(path, "*.xml"))[0], "r", encoding="utf-8") as f:
+            match = re.search(r'type="Parameter".*?shape="([^"]*)"', f.read(), re.S)
+        return match is not None and match.group(1).split(",")[0].strip() in ("?", "-1")
+    except Exception:
+        # Unreadable or unexpected export (or onnx missing): treat it as stale and re-export
+        return False
+
+
+def _is_current(target, weights):
+    # Exports made before batching was supported have a fixed batch of 1 and are rebuilt
+    return (os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(weights)
+            and has_dynamic_batch(target))
+
+
+def check_precision(backend, precision):
+    """Raise ValueError for precision modes the backend cannot run"""
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision {precision!r}, expected one of {', '.join(PRECISIONS)}")
+    if precision == "bf16" and backend != "pytorch":
+        raise ValueError("bfloat16 autocast needs the PyTorch backend")
+    if precision.startswith("int8") and backend != "onnx":
+        raise ValueError("INT8 models run on ONNX Runtime, select the ONNX backend")
+
+
+def quantized_path(weights, precision, imgsz=640):
+    # Kept per input size: static quantization calibrates activation ranges at imgsz
+    size = "" if imgsz == 640 else f"_{imgsz}"
+    return os.path.splitext(weights)[0] + size + "_" + precision.replace("-", "_") + ".onnx"
+
+
+def report_path(model_path):
+    return os.path.splitext(model_path)[0] + "_report.json"
+
+
+def calibration_sources(folder, imgsz=640, limit=100):
+    """Letterboxed BGR arrays of up to limit scans, the same input the GUI sends to the model"""
+    from detector import iter_image_paths
+    from image_loader import decode_scan, letterbox
+
+    for _, path in zip(range(limit), iter_image_paths(folder)):
+        yield letterbox(decode_scan(path), imgsz)[0]
+
+
+class CalibrationReader:
+    """Feeds calibration scans to ONNX Runtime, preprocessed like ultralytics does"""
+
+    def __init__(self, onnx_path, folder, imgsz=640, limit=100):
+        import onnxruntime
+        session = onnxruntime.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+        self.input_name = session.get_inputs()[0].name
+        self.folder = folder
+        self.imgsz = imgsz
+        self.limit = limit
+        self.rewind()
+
+    def get_next(self):
+        import numpy as np
+        bgr = next(self._sources, None)
+        if bgr is None:
+            return None
+        # BGR HWC uint8 -> RGB NCHW float in [0, 1]
+        tensor = bgr[..., ::-1].transpose(2, 0, 1)[None].astype(np.float32) / 255.0
+        return {self.input_name: np.ascontiguousarray(tensor)}
+
+    def rewind(self):
+        # Scans are streamed, so start reading them again rather than keeping them all in memory
+        self._sources = calibration_sources(self.folder, self.imgsz, self.limit)
+
+
+def ensure_quantized(weights, precision, imgsz=640, calibration=None):
+    """Quantize the ONNX export unless an up-to-date INT8 model is already cached"""
+    if not weights.lower().endswith(".pt"):
+        return weights
+    target = quantized_path(weights, precision, imgsz)
+    if _is_current(target, weights):
+        return target
+    if precision == "int8-static" and not calibration:
+        raise ValueError("Static INT8 quantization needs a calibration folder (NEUROVISION_CALIBRATION)")
+
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_dynamic, quantize_static
+
+    source = ensure_exported(weights, "onnx", imgsz)
+    if precision == "int8-dynamic":
+        # ONNX Runtime's CPU kernels have no ConvInteger for signed INT8 weights
+        quantize_dynamic(source, target, weight_type=QuantType.QUInt8)
+    else:
+        quantize_static(source, target, CalibrationReader(source, calibration, imgsz),
+                        quant_format=QuantFormat.QDQ, per_channel=True,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                        calibrate_method=CalibrationMethod.MinMax)
+    _copy_metadata(source, target)
+    _check_session(target, precision)
+
+    if calibration:
+        report = accuracy_report(weights, target, calibration, imgsz=imgsz)
+        report.update(precision=precision, backend="onnx")
+        with open(report_path(target), "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"{PRECISIONS[precision]} model written to {target}: {summary_text(report)}", file=sys.stderr)
+    return target
+
+
+def _check_session(path, precision):
+    """Load a freshly quantized model once so an unusable one fails here, not in every worker"""
+    import onnxruntime
+    try:
+        onnxruntime.InferenceSession(path, providers=["CPUExecutionProvider"])
+    except Exception as e:
+        # Otherwise the broken file would be picked up as an up-to-date cache next time
+        os.remove(path)
+        raise RuntimeError(f"{PRECISIONS[precision]} model {path} does not load in ONNX Runtime: {e}")
+
+
+def _copy_metadata(source, target):
+    # ultralytics reads class names, stride and imgsz from the export's metadata
+    import onnx
+    source_model = onnx.load(source, load_external_data=False)
+    target_model = onnx.load(target)
+    del target_model.metadata_props[:]
+    target_model.metadata_props.extend(source_model.metadata_props)
+    onnx.save(target_model, target)
+
+
+def enable_bfloat16(model):
+    """Run the network's forward pass under CPU bfloat16 autocast, returning FP32 tensors"""
+    import torch
+    net = model.model
+    forward = net.forward
+
+    def to_float(value):
+        if isinstance(value, torch.Tensor):
+            return value.float()
+        if isinstance(value, (list, tuple)):
+            return type(value)(to_float(v) for v in value)
+        return value
+
+    def forward_bf16(*args, **kwargs):
+        with torch.autocast("cpu", dtype=torch.bfloat16):
+            return to_float(forward(*args, **kwargs))
+
+    # NMS and box scaling keep running in FP32
+    net.forward = forward_bf16
+    return model
+
+
+def prepare_weights(weights, backend="pytorch", imgsz=640, precision="fp32", calibration=None):
+    """Export/quantize as needed and return the path the backend should load"""
+    check_precision(backend, precision)
+    if precision.startswith("int8"):
+        return ensure_quantized(weights, precision, imgsz, calibration)
+    return ensure_exported(weights, backend, imgsz)
+
+
+def load_backend_model(weights, backend="pytorch", imgsz=640, precision="fp32", calibration=None):
+    """YOLO object running on the requested backend; the call API is the same for all of them"""
+    from ultralytics import YOLO
+    path = prepare_weights(weights, backend, imgsz, precision, calibration)
+    if backend == "pytorch":
+        model = YOLO(path)
+        return enable_bfloat16(model) if precision == "bf16" else model
+    return YOLO(path, task="detect")
+
+
+def box_iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def compare_records(reference, candidate, iou_threshold=0.5):
+    """Greedily match boxes of two detection records and measure how far apart they are"""
+    unmatched = list(range(len(candidate["boxes"])))
+    ious = []
+    conf_deltas = []
+
+    order = sorted(range(len(reference["boxes"])), key=lambda i: -reference["confidences"][i])
+    for i in order:
+        best, best_iou = None, iou_threshold
+        for j in unmatched:
+            iou = box_iou(reference["boxes"][i], candidate["boxes"][j])
+            if iou >= best_iou:
+                best, best_iou = j, iou
+        if best is None:
+            continue
+        unmatched.remove(best)
+        ious.append(best_iou)
+        conf_deltas.append(abs(reference["confidences"][i] - candidate["confidences"][best]))
+
+    return {
+        "matched": len(ious),
+        "missed": len(reference["boxes"]) - len(ious),
+        "extra": len(unmatched),
+        "ious": ious,
+        "conf_deltas": conf_deltas,
+        "same_result": reference["result"] == candidate["result"],
+    }
+
+
+def parity_check(reference_model, candidate_model, sources, conf=0.25, imgsz=640,
+                 iou_threshold=0.5, conf_tolerance=0.05):
+    """Run both models over the same inputs and summarise how well the candidate agrees"""
+    from detector import result_to_record
+
+    totals = {"images": 0, "matched": 0, "missed": 0, "extra": 0, "result_mismatches": 0}
+    ious = []
+    conf_deltas = []
+    reference_s = []
+    candidate_s = []
+
+    for source in sources:
+        start = time.perf_counter()
+        reference = result_to_record(reference_model(source, conf=conf, imgsz=imgsz, verbose=False)[0])
+        reference_s.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        candidate = result_to_record(candidate_model(source, conf=conf, imgsz=imgsz, verbose=False)[0])
+        candidate_s.append(time.perf_counter() - start)
+        comparison = compare_records(reference, candidate, iou_threshold)
+
+        totals["images"] += 1
+        for key in ("matched", "missed", "extra"):
+            totals[key] += comparison[key]
+        totals["result_mismatches"] += 0 if comparison["same_result"] else 1
+        ious.extend(comparison["ious"])
+        conf_deltas.extend(comparison["conf_deltas"])
+
+    report = dict(totals)
+    report["mean_iou"] = round(sum(ious) / len(ious), 4) if ious else None
+    report["max_conf_delta"] = round(max(conf_deltas), 4) if conf_deltas else 0.0
+    report["mean_conf_delta"] = round(sum(conf_deltas) / len(conf_deltas), 4) if conf_deltas else 0.0
+    if reference_s:
+        # The first call of each model pays for lazy initialisation, leave it out when possible
+        ref, cand = (reference_s[1:] or reference_s), (candidate_s[1:] or candidate_s)
+        report["reference_ms"] = round(sum(ref) / len(ref) * 1000, 2)
+        report["candidate_ms"] = round(sum(cand) / len(cand) * 1000, 2)
+        report["speedup"] = round(report["reference_ms"] / report["candidate_ms"], 2) if report["candidate_ms"] else None
+    report["passed"] = (totals["missed"] == 0 and totals["extra"] == 0 and
+                        totals["result_mismatches"] == 0 and report["max_conf_delta"] <= conf_tolerance)
+    return report
+
+
+def accuracy_report(weights, candidate, folder, imgsz=640, limit=100, precision="fp32", backend="onnx"):
+    """Parity of a candidate model (loaded model or path) against FP32 PyTorch on a folder of scans"""
+    reference = load_backend_model(weights, "pytorch", imgsz)
+    if isinstance(candidate, str):
+        candidate = load_backend_model(candidate, backend, imgsz, precision)
+    return parity_check(reference, candidate, calibration_sources(folder, imgsz, limit), imgsz=imgsz)
+
+
+def summary_text(report):
+    text = (f"{report['matched']} boxes matched, {report['missed']} missed, {report['extra']} extra, "
+            f"max confidence delta {report['max_conf_delta']:.3f}")
+    if report.get("speedup"):
+        text += f", {report['candidate_ms']:.1f}ms vs {report['reference_ms']:.1f}ms ({report['speedup']:.2f}x)"
+    return text
+
+
+def main(argv=None):
+    from detector import DEFAULT_WEIGHTS, iter_image_paths
+    from image_loader import decode_scan, to_model_input
+
+    parser = argparse.ArgumentParser(description="Export a backend and check parity with FP32 PyTorch")
+    parser.add_argument("source", help="Image file or folder of scans to compare on")
+    parser.add_argument("--weights", default=DEFAULT_WEIGHTS)
+    parser.add_argument("--backend", choices=list(BACKENDS), default="onnx")
+    parser.add_argument("--precision", choices=list(PRECISIONS), default="fp32")
+    parser.add_argument("--calibration", default=DEFAULT_CALIBRATION,
+                        help="Folder of scans used to calibrate static INT8 quantization")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--limit", type=int, default=50, help="Maximum number of scans to compare")
+    parser.add_argument("--conf-tolerance", type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    reference = load_backend_model(args.weights, "pytorch")
+    candidate = load_backend_model(args.weights, args.backend, args.imgsz, args.precision, args.calibration)
+
+    paths = iter_image_paths(args.source)
+    sources = (to_model_input(decode_scan(p)) for _, p in zip(range(args.limit), paths))
+    report = parity_check(reference, candidate, sources, imgsz=args.imgsz, conf_tolerance=args.conf_tolerance)
+    report["backend"] = args.backend
+    report["precision"] = args.precision
+
+    print(json.dumps(report, indent=2))
+    return 0 if report["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+NeuroVision AI - headless batch detection
+
+Walks a directory of scans, runs the YOLOv8 model over them in batches and
+streams one result per image to JSONL or CSV. The GUI window is never created.
+
+Example:
+    python batch_detect.py scans/ -o results.jsonl --batch-size 16 --include "*.jpg"
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from backends import BACKENDS, DEFAULT_BACKEND, DEFAULT_CALIBRATION, DEFAULT_PRECISION, PRECISIONS
+from detector import DEFAULT_WEIGHTS, load_model, iter_image_paths, batched, detect_batch
+from image_loader import decode_scan, to_model_input
+from instrumentation import tracer
+from model_registry import resolve_weights
+from tiling import MERGE_METHODS, check_tiling, detect_tiled
+
+CSV_FIELDS = ["path", "result", "regions", "confidence", "boxes", "confidences",
+              "labels", "time_taken", "error"]
+
+
+class JsonlWriter:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, record):
+        self.stream.write(json.dumps(record) + "\n")
+
+    def flush(self):
+        self.stream.flush()
+
+
+class CsvWriter:
+    def __init__(self, stream):
+        self.stream = stream
+        self.writer = csv.DictWriter(stream, fieldnames=CSV_FIELDS, extrasaction="ignore")
+        self.writer.writeheader()
+
+    def write(self, record):
+        row = dict(record)
+        # Nested lists are stored as JSON strings so every row stays one line
+        for key in ("boxes", "confidences", "labels"):
+            row[key] = json.dumps(row.get(key, []))
+        self.writer.writerow(row)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="NeuroVision AI headless batch tumor detection")
+    parser.add_argument("source", help="Image file or directory of scans")
+    parser.add_argument("-o", "--output", default="-",
+                        help="Output file (.jsonl or .csv), '-' for stdout (default)")
+    parser.add_argument("--format", choices=["jsonl", "csv"],
+                        help="Output format (default: guessed from the output extension)")
+    parser.add_argument("--weights", default=DEFAULT_WEIGHTS, help="YOLOv8 weights file or registered model name")
+    parser.add_argument("--backend", choices=list(BACKENDS), default=DEFAULT_BACKEND,
+                        help="Inference engine; ONNX/OpenVINO exports are cached next to the weights")
+    parser.add_argument("--precision", choices=list(PRECISIONS), default=DEFAULT_PRECISION,
+                        help="bf16 needs the pytorch backend, the int8 modes the onnx backend")
+    parser.add_argument("--calibration", default=DEFAULT_CALIBRATION,
+                        help="Folder of scans for static INT8 calibration and the accuracy report")
+    parser.add_argument("--batch-size", type=int, default=8, help="Images per forward pass")
+    parser.add_argument("--include", action="append",
+                        help="Glob filter for file names, may be repeated (default: all image types)")
+    parser.add_argument("--no-recursive", action="store_true", help="Do not descend into subdirectories")
+    parser.add_argument("--conf", type=float, default=0.25, help="Confidence threshold")
+    parser.add_argument("--imgsz", type=int, default=640, help="Inference image size")
+    parser.add_argument("--tile", type=int, default=0,
+                        help="Tiled inference with this tile size for scans larger than one tile (0 = off)")
+    parser.add_argument("--tile-overlap", type=float, default=0.2, help="Fraction of overlap between tiles")
+    parser.add_argument("--tile-merge", choices=MERGE_METHODS, default="wbf",
+                        help="How detections from overlapping tiles are merged")
+    parser.add_argument("--trace", help="Write a Chrome trace (JSON) of per-batch stages to this file")
+    parser.add_argument("--progress-every", type=int, default=100,
+                        help="Print throughput to stderr every N images (0 to disable)")
+    return parser.parse_args(argv)
+
+
+def detect_paths(model, paths, args):
+    """Records for one batch of paths; in tiled mode every large scan is its own batch of tiles"""
+    with tracer.stage("decode", batch=len(paths)):
+        pixels = [decode_scan(path) for path in paths]
+
+    if not args.tile:
+        with tracer.stage("inference", batch=len(paths)):
+            return detect_batch(model, [to_model_input(p) for p in pixels], conf=args.conf, imgsz=args.imgsz)
+
+    records = []
+    for scan in pixels:
+        with tracer.stage("inference", batch=1):
+            if max(scan.shape[:2]) > args.tile:
+                records.append(detect_tiled(model, scan, conf=args.conf, imgsz=args.imgsz, tile=args.tile,
+                                            overlap=args.tile_overlap, method=args.tile_merge))
+            else:
+                records.extend(detect_batch(model, [to_model_input(scan)], conf=args.conf, imgsz=args.imgsz))
+    return records
+
+
+def run_batch(args):
+    fmt = args.format or ("csv" if args.output.lower().endswith(".csv") else "jsonl")
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+    writer = CsvWriter(out) if fmt == "csv" else JsonlWriter(out)
+
+    load_start = time.perf_counter()
+    model = load_model(resolve_weights(args.weights), args.backend, args.imgsz, args.precision, args.calibration)
+    print(f"Model loaded in {time.perf_counter() - load_start:.2f}s", file=sys.stderr)
+
+    paths = iter_image_paths(args.source, args.include, recursive=not args.no_recursive)
+
+    processed = 0
+    failed = 0
+    start_time = time.perf_counter()
+    next_report = args.progress_every
+
+    try:
+        for batch in batched(paths, max(1, args.batch_size)):
+            try:
+                # Decode through image_loader so DICOM and 16-bit scans work too
+                records = detect_paths(model, batch, args)
+            except Exception:
+                # One unreadable file should not take the whole batch down
+                records = []
+                for path in batch:
+                    try:
+                        records.extend(detect_paths(model, [path], args))
+                    except Exception as e:
+                        records.append({"result": "Error", "error": str(e)})
+
+            for path, record in zip(batch, records):
+                record["path"] = path
+                if record.get("result") == "Error":
+                    failed += 1
+                writer.write(record)
+            writer.flush()
+
+            processed += len(batch)
+            if args.progress_every and processed >= next_report:
+                elapsed = time.perf_counter() - start_time
+                print(f"{processed} images, {processed / elapsed:.1f} images/s", file=sys.stderr)
+                next_report += args.progress_every
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if args.trace:
+            tracer.write_chrome_trace(args.trace)
+
+    elapsed = time.perf_counter() - start_time
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    print(f"Done: {processed} images ({failed} failed) in {elapsed:.2f}s - {rate:.1f} images/s",
+          file=sys.stderr)
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.tile:
+        try:
+            check_tiling(args.tile, args.tile_overlap)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+    if not os.path.exists(args.source):
+        print(f"Error: {args.source} does not exist", file=sys.stderr)
+        return 2
+    return run_batch(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
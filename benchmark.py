@@ -0,0 +1,260 @@
+"""
+NeuroVision AI - CPU benchmark for the detection path
+
+Generates synthetic MRI-like scans of several sizes and formats, runs the
+headless detection path (model load, decode, letterbox, inference, annotation,
+save) across image sizes, batch sizes and torch thread counts, and writes a
+JSON report. Pass --compare with an earlier report to flag regressions, e.g.
+after upgrading ultralytics/torch or swapping the model.
+
+Example:
+    python benchmark.py --sizes 256 512 1024 --batch-sizes 1 4 --threads 1 4 -o bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from backends import BACKENDS, DEFAULT_CALIBRATION, PRECISIONS
+from detector import DEFAULT_WEIGHTS, load_model, result_to_record, warm_up
+from image_loader import decode_scan, letterbox, pydicom
+from overlay import render_full
+
+FORMATS = ("png", "jpg", "png16", "dcm")
+
+
+def synthetic_scan(size, seed=0):
+    """Grayscale axial-slice lookalike: skull ring, brain tissue, noise and one bright lesion"""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:size, 0:size].astype(np.float32) / size - 0.5
+
+    head = (xx / 0.42) ** 2 + (yy / 0.48) ** 2
+    image = np.where(head < 1.0, 0.45, 0.0).astype(np.float32)
+    image[(head >= 0.85) & (head < 1.0)] = 0.9  # skull
+
+    # Gyri-like texture inside the brain
+    texture = np.sin(xx * 60 + np.sin(yy * 25) * 3) * 0.08
+    image[head < 0.85] += texture[head < 0.85]
+
+    cx, cy = rng.uniform(-0.2, 0.2, size=2)
+    lesion = ((xx - cx) / 0.06) ** 2 + ((yy - cy) / 0.05) ** 2
+    image[lesion < 1.0] = 0.85
+
+    image += rng.normal(0, 0.03, image.shape).astype(np.float32)
+    return np.clip(image, 0, 1)
+
+
+def write_scan(image, path, fmt):
+    if fmt == "png16":
+        cv2.imwrite(path, (image * 65535).astype(np.uint16))
+    elif fmt == "dcm":
+        write_dicom(image, path)
+    else:
+        cv2.imwrite(path, (image * 255).astype(np.uint8))
+
+
+def write_dicom(image, path):
+    from pydicom.dataset import FileDataset, FileMetaDataset
+    from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = "1.2.840.10008.5.1.4.1.1.4"  # MR Image Storage
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+
+    ds = FileDataset(path, {}, file_meta=meta, preamble=b"\0" * 128)
+    ds.SOPClassUID = meta.MediaStorageSOPClassUID
+    ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+    ds.Modality = "MR"
+    ds.Rows, ds.Columns = image.shape
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = "MONOCHROME2"
+    ds.BitsAllocated = 16
+    ds.BitsStored = 12
+    ds.HighBit = 11
+    ds.PixelRepresentation = 0
+    ds.WindowCenter = 2048
+    ds.WindowWidth = 4096
+    ds.PixelData = (image * 4095).astype(np.uint16).tobytes()
+    ds.save_as(path, write_like_original=False)
+
+
+def generate_dataset(folder, sizes, formats, per_size):
+    paths = {}
+    for size in sizes:
+        for fmt in formats:
+            ext = "png" if fmt == "png16" else fmt
+            for i in range(per_size):
+                path = os.path.join(folder, f"scan_{size}_{fmt}_{i}.{ext}")
+                write_scan(synthetic_scan(size, seed=i), path, fmt)
+                paths.setdefault((size, fmt), []).append(path)
+    return paths
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "median_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000, 3),
+        "min_ms": round(ordered[0] * 1000, 3),
+    }
+
+
+def bench_case(model, paths, batch_size, imgsz, repeats, output_dir):
+    """Time each stage of the detection path for one configuration"""
+    timings = {"decode": [], "letterbox": [], "inference": [], "annotate": [], "save": [], "total": []}
+
+    batch = (paths * batch_size)[:batch_size]
+    for _ in range(repeats):
+        total_start = time.perf_counter()
+
+        start = time.perf_counter()
+        decoded = [decode_scan(p) for p in batch]
+        timings["decode"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        inputs = [letterbox(pixels, imgsz)[0] for pixels in decoded]
+        timings["letterbox"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        results = model(inputs, imgsz=imgsz, verbose=False)
+        timings["inference"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        annotated = [render_full(img, result_to_record(result)) for img, result in zip(inputs, results)]
+        timings["annotate"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for i, img in enumerate(annotated):
+            cv2.imwrite(os.path.join(output_dir, f"annotated_{i}.png"), img)
+        timings["save"].append(time.perf_counter() - start)
+
+        timings["total"].append(time.perf_counter() - total_start)
+
+    stages = {name: summarize(samples) for name, samples in timings.items()}
+    images_per_s = batch_size / statistics.median(timings["total"])
+    return {"stages": stages, "images_per_s": round(images_per_s, 3)}
+
+
+def environment():
+    versions = {}
+    for module in ("torch", "ultralytics", "numpy", "cv2", "PIL", "pydicom", "onnxruntime", "openvino"):
+        try:
+            versions[module] = getattr(__import__(module), "__version__", "unknown")
+        except ImportError:
+            continue
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "versions": versions,
+    }
+
+
+def compare_reports(report, baseline, tolerance):
+    """Return (case name, stage, baseline ms, current ms) for stages slower than tolerance"""
+    def index(rep):
+        return {case["name"]: case for case in rep["results"]}
+
+    regressions = []
+    base_cases = index(baseline)
+    for name, case in index(report).items():
+        base = base_cases.get(name)
+        if base is None:
+            continue
+        for stage, summary in case["stages"].items():
+            before = base["stages"].get(stage, {}).get("median_ms")
+            after = summary["median_ms"]
+            if before and after > before * (1 + tolerance):
+                regressions.append((name, stage, before, after))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="NeuroVision AI CPU detection benchmark")
+    parser.add_argument("--weights", default=DEFAULT_WEIGHTS)
+    parser.add_argument("--backend", choices=list(BACKENDS), default="pytorch")
+    parser.add_argument("--precision", choices=list(PRECISIONS), default="fp32")
+    parser.add_argument("--calibration", default=DEFAULT_CALIBRATION)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[256, 512, 1024, 2048])
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=["png", "jpg", "png16", "dcm"])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed runs before each case")
+    parser.add_argument("-o", "--output", default="benchmark_report.json")
+    parser.add_argument("--compare", help="Earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Relative slowdown of a stage median that counts as a regression")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    import torch
+
+    formats = list(args.formats)
+    if "dcm" in formats and pydicom is None:
+        print("pydicom is not installed, skipping the DICOM format", file=sys.stderr)
+        formats.remove("dcm")
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": environment(),
+        "config": dict(vars(args), formats=formats),
+        "results": [],
+    }
+
+    with tempfile.TemporaryDirectory(prefix="neurovision_bench_") as workdir:
+        print("Generating synthetic scans...", file=sys.stderr)
+        dataset = generate_dataset(workdir, args.sizes, formats, per_size=max(args.batch_sizes))
+
+        start = time.perf_counter()
+        model = load_model(args.weights, args.backend, args.imgsz, args.precision, args.calibration)
+        report["model_load_s"] = round(time.perf_counter() - start, 3)
+
+        start = time.perf_counter()
+        warm_up(model, args.imgsz)
+        report["first_inference_s"] = round(time.perf_counter() - start, 3)
+
+        for threads in args.threads:
+            torch.set_num_threads(threads)
+            cv2.setNumThreads(threads)
+            for (size, fmt), paths in dataset.items():
+                for batch_size in args.batch_sizes:
+                    name = f"{fmt}-{size}px-batch{batch_size}-threads{threads}"
+                    for _ in range(args.warmup):
+                        bench_case(model, paths, batch_size, args.imgsz, 1, workdir)
+                    result = bench_case(model, paths, batch_size, args.imgsz, args.repeats, workdir)
+                    result.update(name=name, format=fmt, size=size, batch_size=batch_size, threads=threads)
+                    report["results"].append(result)
+                    print(f"{name}: {result['images_per_s']:.2f} images/s, "
+                          f"inference median {result['stages']['inference']['median_ms']:.1f}ms",
+                          file=sys.stderr)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_reports(report, baseline, args.tolerance)
+        for name, stage, before, after in regressions:
+            print(f"REGRESSION {name} {stage}: {before:.1f}ms -> {after:.1f}ms", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
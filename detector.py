@@ -0,0 +1,108 @@
+import os
+import fnmatch
+import time
+
+# Default YOLOv8 weights, can be overridden with the NEUROVISION_WEIGHTS environment variable
+DEFAULT_WEIGHTS = os.environ.get("NEUROVISION_WEIGHTS", "best.pt")
+
+# Image types accepted by the detector when walking directories
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".dcm")
+
+
+def load_model(weights=DEFAULT_WEIGHTS, backend="pytorch", imgsz=640, precision="fp32", calibration=None):
+    """Load the YOLOv8 model on a backend (ultralytics is imported lazily so CLI startup stays fast)"""
+    from backends import load_backend_model
+    return load_backend_model(weights, backend, imgsz, precision, calibration)
+
+
+def iter_image_paths(root, patterns=None, recursive=True):
+    """Yield image paths under root one at a time, filtered by glob patterns"""
+    if os.path.isfile(root):
+        yield root
+        return
+
+    patterns = patterns or ["*" + ext for ext in IMAGE_EXTENSIONS]
+
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if any(fnmatch.fnmatch(filename.lower(), p.lower()) for p in patterns):
+                yield os.path.join(dirpath, filename)
+        if not recursive:
+            break
+
+
+def batched(iterable, size):
+    """Group an iterable into lists of at most size items without materializing it"""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def result_to_record(result):
+    """Convert an ultralytics Results object into a plain, JSON-serializable dict"""
+    boxes = result.boxes
+    names = result.names or {}
+
+    xyxy = boxes.xyxy.cpu().numpy().tolist() if len(boxes) else []
+    confidences = boxes.conf.cpu().numpy().tolist() if len(boxes) else []
+    classes = boxes.cls.cpu().numpy().astype(int).tolist() if len(boxes) else []
+
+    return {
+        "result": "Positive" if len(boxes) > 0 else "Negative",
+        "regions": len(boxes),
+        "boxes": [[round(v, 2) for v in box] for box in xyxy],
+        "confidences": [round(c, 4) for c in confidences],
+        "classes": classes,
+        "labels": [names.get(c, str(c)) for c in classes],
+        "confidence": max(confidences) if confidences else None,
+        "orig_shape": list(result.orig_shape),
+        # ultralytics reports per-image preprocess/inference/postprocess times in ms
+        "speed_ms": {k: round(v, 2) for k, v in (result.speed or {}).items()},
+    }
+
+
+def unletterbox_record(record, letterbox):
+    """Map boxes predicted on a letterboxed input back to original image coordinates"""
+    scale = letterbox["scale"]
+    pad_x, pad_y = letterbox["pad"]
+    height, width = letterbox["orig_shape"]
+
+    boxes = []
+    for x1, y1, x2, y2 in record["boxes"]:
+        boxes.append([
+            round(min(max((x1 - pad_x) / scale, 0), width), 2),
+            round(min(max((y1 - pad_y) / scale, 0), height), 2),
+            round(min(max((x2 - pad_x) / scale, 0), width), 2),
+            round(min(max((y2 - pad_y) / scale, 0), height), 2),
+        ])
+    record["boxes"] = boxes
+    record["orig_shape"] = [height, width]
+    return record
+
+
+def detect_batch(model, sources, conf=0.25, imgsz=640):
+    """Run one batched forward pass over a list of paths or arrays and return records"""
+    start_time = time.perf_counter()
+    results = model(sources, conf=conf, imgsz=imgsz, verbose=False)
+    batch_time = time.perf_counter() - start_time
+
+    records = []
+    for source, result in zip(sources, results):
+        record = result_to_record(result)
+        record["batch_time_s"] = round(batch_time, 4)
+        record["time_taken"] = round(batch_time / len(sources), 4)
+        records.append(record)
+    return records
+
+
+def warm_up(model, imgsz=640):
+    """Run a dummy inference so the first real scan does not pay the first-call cost"""
+    import numpy as np
+    dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+    model(dummy, imgsz=imgsz, verbose=False)
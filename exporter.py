@@ -0,0 +1,166 @@
+"""
+NeuroVision AI - result export
+
+Results are encoded and written by a small background pool, so slow disks and
+network shares never block the window. Every exported image gets a JSON
+sidecar with the detections, the model that produced them and the timings.
+Bulk exports stream one entry at a time to a folder or a zip archive.
+"""
+import io
+import json
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+from PIL import Image
+
+EXPORT_FORMATS = {
+    "png": {"extension": ".png", "pil_format": "PNG"},
+    "webp": {"extension": ".webp", "pil_format": "WEBP"},
+    "jpeg": {"extension": ".jpg", "pil_format": "JPEG"},
+}
+
+# Default location of saved results
+DEFAULT_EXPORT_DIR = "NeuroVision_Results"
+
+
+def encode_image(image, fmt="png", quality=95, png_compression=6):
+    """Encode an RGB array or PIL image; quality applies to JPEG/WebP, png_compression (0-9) to PNG"""
+    if isinstance(image, np.ndarray):
+        image = Image.fromarray(image)
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    options = {}
+    if fmt == "png":
+        options["compress_level"] = int(png_compression)
+    elif fmt == "webp":
+        options.update(quality=int(quality), method=4, lossless=int(quality) >= 100)
+    else:
+        options.update(quality=int(quality), optimize=True)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format=EXPORT_FORMATS[fmt]["pil_format"], **options)
+    return buffer.getvalue()
+
+
+def sidecar(record, source=None, model=None, timings=None, image_size=None):
+    """JSON-serializable description of one exported result"""
+    data = {
+        "source": source,
+        "exported_at": datetime.now().isoformat(timespec="seconds"),
+        "result": record.get("result"),
+        "regions": record.get("regions", 0),
+        "confidence": record.get("confidence"),
+        "boxes": record.get("boxes", []),
+        "confidences": record.get("confidences", []),
+        "classes": record.get("classes", []),
+        "labels": record.get("labels", []),
+        "orig_shape": record.get("orig_shape"),
+        # Records from the GUI and the HTTP service carry the model that produced them
+        "model": record.get("model") or model or {},
+        "timings": dict(timings or {}, time_taken=record.get("time_taken"),
+                        stages_ms=record.get("stages_ms", {})),
+    }
+    if record.get("tiles"):
+        data["tiles"] = record["tiles"]
+    if image_size:
+        data["image_size"] = list(image_size)
+    return data
+
+
+def _write_atomic(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class ResultExporter:
+    """Background encoder pool for single results and bulk history exports"""
+
+    def __init__(self, workers=2, fmt="png", quality=95, png_compression=6):
+        self.fmt = fmt
+        self.quality = quality
+        self.png_compression = png_compression
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export")
+
+    def configure(self, fmt=None, quality=None, png_compression=None):
+        if fmt is not None:
+            if fmt not in EXPORT_FORMATS:
+                raise ValueError(f"Unknown export format {fmt!r}, expected one of {', '.join(EXPORT_FORMATS)}")
+            self.fmt = fmt
+        if quality is not None:
+            self.quality = quality
+        if png_compression is not None:
+            self.png_compression = png_compression
+
+    def export(self, render, record, folder, stem, source=None, model=None, timings=None):
+        """Render, encode and write one result plus its sidecar; the Future holds the image path.
+
+        render() is called on the export thread and returns the full-resolution RGB image,
+        so the Tk thread only takes a snapshot of what to export.
+        """
+        fmt, quality, png_compression = self.fmt, self.quality, self.png_compression
+
+        def job():
+            image = render()
+            data = encode_image(image, fmt, quality, png_compression)
+            os.makedirs(folder, exist_ok=True)
+            path = os.path.join(folder, stem + EXPORT_FORMATS[fmt]["extension"])
+            size = image.shape[1::-1] if isinstance(image, np.ndarray) else image.size
+            meta = sidecar(record, source, model, timings, size)
+            # Image first, sidecar last, so a sidecar always points at a complete image
+            _write_atomic(path, data)
+            _write_atomic(os.path.splitext(path)[0] + ".json", json.dumps(meta, indent=2).encode("utf-8"))
+            return path
+
+        return self._pool.submit(job)
+
+    def export_many(self, items, destination, model=None, on_progress=None):
+        """Stream (stem, render, record, source) items into a folder or, for a .zip path, an archive.
+
+        Items are rendered and encoded one at a time, so only one image is held in memory
+        no matter how long the history is. The Future holds the number of exported items.
+        """
+        fmt, quality, png_compression = self.fmt, self.quality, self.png_compression
+        extension = EXPORT_FORMATS[fmt]["extension"]
+
+        def job():
+            count = 0
+            to_zip = destination.lower().endswith(".zip")
+            archive = zipfile.ZipFile(destination + ".tmp", "w") if to_zip else None
+            if not to_zip:
+                os.makedirs(destination, exist_ok=True)
+            try:
+                for stem, render, record, source in items:
+                    image = render()
+                    data = encode_image(image, fmt, quality, png_compression)
+                    size = image.shape[1::-1] if isinstance(image, np.ndarray) else image.size
+                    meta = json.dumps(sidecar(record, source, model, image_size=size), indent=2).encode("utf-8")
+                    if archive is not None:
+                        # Images are already compressed; only the sidecars are deflated
+                        archive.writestr(stem + extension, data, compress_type=zipfile.ZIP_STORED)
+                        archive.writestr(stem + ".json", meta, compress_type=zipfile.ZIP_DEFLATED)
+                    else:
+                        _write_atomic(os.path.join(destination, stem + extension), data)
+                        _write_atomic(os.path.join(destination, stem + ".json"), meta)
+                    count += 1
+                    if on_progress:
+                        on_progress(count)
+            except BaseException:
+                if archive is not None:
+                    archive.close()
+                    os.remove(destination + ".tmp")
+                raise
+            if archive is not None:
+                archive.close()
+                os.replace(destination + ".tmp", destination)
+            return count
+
+        return self._pool.submit(job)
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,113 @@
+import tkinter as tk
+
+import customtkinter as ctk
+
+ROW_HEIGHT = 34  # 30px button plus 2px padding above and below
+
+
+class VirtualHistoryList(ctk.CTkFrame):
+    """Scan history list that only creates buttons for the rows in the viewport.
+
+    A fixed pool of row buttons is moved and relabelled as the list scrolls, so
+    adding an entry or changing the theme costs O(visible rows) no matter how long
+    the history gets. Entries are shown newest first. button_style(theme) returns
+    the colour options for the row buttons.
+    """
+
+    def __init__(self, master, history, on_select, theme, button_style, **kwargs):
+        super().__init__(master, fg_color="transparent", **kwargs)
+        self.history = history
+        self.on_select = on_select
+        self.theme = theme
+        self.button_style = button_style
+        self._rows = []
+        self._first_index = None
+
+        self.canvas = tk.Canvas(self, highlightthickness=0, bd=0, bg=theme["card"])
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+
+        self.canvas.bind("<Configure>", self._on_resize)
+        self._bind_wheel(self.canvas)
+
+    def refresh(self):
+        """Call after entries were added; only the visible rows are touched"""
+        self.canvas.configure(scrollregion=(0, 0, self.canvas.winfo_width(), len(self.history) * ROW_HEIGHT))
+        self._first_index = None
+        self._render()
+
+    def apply_theme(self, theme):
+        self.theme = theme
+        self.canvas.configure(bg=theme["card"])
+        style = self.button_style(theme)
+        for button, _ in self._rows:
+            button.configure(**style)
+
+    def _entry_at(self, index):
+        # Row 0 is the newest entry
+        return self.history[len(self.history) - 1 - index]
+
+    def _on_scrollbar(self, *args):
+        self.canvas.yview(*args)
+        self._render()
+
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self._on_wheel)
+        widget.bind("<Button-4>", lambda e: self._scroll_units(-1))
+        widget.bind("<Button-5>", lambda e: self._scroll_units(1))
+
+    def _on_wheel(self, event):
+        # Windows reports multiples of 120, macOS small deltas
+        step = -1 if event.delta > 0 else 1
+        self._scroll_units(step * max(1, abs(event.delta) // 120))
+
+    def _scroll_units(self, units):
+        self.canvas.yview_scroll(units, "units")
+        self._render()
+
+    def _on_resize(self, event):
+        self.canvas.configure(yscrollincrement=ROW_HEIGHT)
+        self._ensure_rows(event.height // ROW_HEIGHT + 2)
+        for _, item in self._rows:
+            self.canvas.itemconfigure(item, width=event.width)
+        self.refresh()
+
+    def _ensure_rows(self, count):
+        while len(self._rows) < count:
+            button = ctk.CTkButton(
+                self.canvas,
+                text="",
+                font=("Roboto", 10),
+                anchor="w",
+                height=30,
+                **self.button_style(self.theme)
+            )
+            self._bind_wheel(button)
+            item = self.canvas.create_window(0, -ROW_HEIGHT, window=button, anchor="nw",
+                                             width=max(1, self.canvas.winfo_width()), state="hidden")
+            self._rows.append((button, item))
+
+    def _render(self):
+        total = len(self.history)
+        top = self.canvas.canvasy(0)
+        first = max(0, int(top // ROW_HEIGHT))
+        if first == self._first_index:
+            return
+        self._first_index = first
+
+        for slot, (button, item) in enumerate(self._rows):
+            index = first + slot
+            if index >= total:
+                self.canvas.itemconfigure(item, state="hidden")
+                continue
+
+            entry = self._entry_at(index)
+            button.configure(
+                text=f"{entry['timestamp']} - {entry['filename'][:15]}... ({entry['result']})",
+                command=lambda e=entry: self.on_select(e)
+            )
+            self.canvas.coords(item, 0, index * ROW_HEIGHT + 2)
+            self.canvas.itemconfigure(item, state="normal")
@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+# In-memory budget for full-resolution result images, configurable in MB
+DEFAULT_MEMORY_BUDGET = int(os.environ.get("NEUROVISION_HISTORY_MB", "64")) * 1024 * 1024
+
+
+def image_nbytes(img):
+    return img.width * img.height * len(img.getbands())
+
+
+class HistoryStore:
+    """Scan history that keeps only compact metadata per entry in memory.
+
+    Full result images are spilled to a local disk cache as soon as they are added
+    and kept in an LRU bounded by memory_budget bytes; evicted images are reloaded
+    lazily by get_image(). Behaves like the old list of entry dicts for reading.
+    """
+
+    def __init__(self, memory_budget=DEFAULT_MEMORY_BUDGET, spill_dir=None):
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir or tempfile.mkdtemp(prefix="neurovision_history_")
+        os.makedirs(self.spill_dir, exist_ok=True)
+
+        self._entries = []
+        self._images = OrderedDict()
+        self._image_bytes = 0
+        self._writes = {}
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-spill")
+
+    def append(self, entry):
+        """Add an entry dict; its "image" is moved out of the dict into the store"""
+        image = entry.pop("image")
+        entry_id = len(self._entries)
+        entry["id"] = entry_id
+        self._entries.append(entry)
+
+        with self._lock:
+            self._writes[entry_id] = self._writer.submit(self._spill, entry_id, image)
+            self._remember(entry_id, image)
+        return entry
+
+    def get_image(self, entry):
+        """Full-resolution result image, reloaded from the disk cache if it was evicted"""
+        entry_id = entry["id"]
+        with self._lock:
+            image = self._images.get(entry_id)
+            if image is not None:
+                self._images.move_to_end(entry_id)
+                return image
+            write = self._writes.get(entry_id)
+
+        if write is not None:
+            write.result()
+        with Image.open(self._path(entry_id)) as img:
+            image = img.convert("RGB")
+
+        with self._lock:
+            self._remember(entry_id, image)
+        return image
+
+    def close(self):
+        self._writer.shutdown(wait=True)
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __reversed__(self):
+        return reversed(self._entries)
+
+    def __getitem__(self, index):
+        return self._entries[index]
+
+    def _path(self, entry_id):
+        return os.path.join(self.spill_dir, f"{entry_id}.png")
+
+    def _spill(self, entry_id, image):
+        # compress_level=1: this is a scratch cache, speed matters more than size
+        image.save(self._path(entry_id), format="PNG", compress_level=1)
+        with self._lock:
+            self._writes.pop(entry_id, None)
+            self._evict()
+
+    def _remember(self, entry_id, image):
+        if entry_id not in self._images:
+            self._image_bytes += image_nbytes(image)
+        self._images[entry_id] = image
+        self._images.move_to_end(entry_id)
+        self._evict()
+
+    def _evict(self):
+        # Oldest first, but never an image that is not on disk yet
+        for entry_id in list(self._images):
+            if self._image_bytes <= self.memory_budget:
+                break
+            if entry_id in self._writes:
+                continue
+            self._image_bytes -= image_nbytes(self._images.pop(entry_id))
@@ -0,0 +1,296 @@
+"""
+NeuroVision AI - local HTTP inference service
+
+Lets other tools on the workstation get detections from the model the GUI has
+already loaded instead of loading their own copy of the weights. The service
+only listens on localhost by default, runs a bounded number of requests at
+once and reports where the time went in a Server-Timing header.
+
+POST /detect takes either the encoded scan as the request body or a JSON body
+{"path": "..."} naming a file on this machine, and returns the detection
+record as JSON. Query parameters: conf, and tile (tile size, 0 = off) with
+tile_overlap and tile_merge. GET /health reports whether the model is ready.
+
+Run it inside the GUI by setting NEUROVISION_HTTP_PORT (or "http_port" in
+neurovision_settings.json), or on its own without a window:
+    python http_service.py --port 8765 --weights best.pt
+    curl --data-binary @scan.png http://127.0.0.1:8765/detect
+    curl -d '{"path": "/scans/case1.dcm"}' -H "Content-Type: application/json" http://127.0.0.1:8765/detect
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from backends import BACKENDS, DEFAULT_BACKEND, DEFAULT_CALIBRATION, DEFAULT_PRECISION, PRECISIONS
+from detector import DEFAULT_WEIGHTS
+from image_loader import ScanImage, decode_scan, decode_scan_bytes
+from inference_worker import DEFAULT_WORKERS, InferencePool
+from model_registry import resolve_weights
+from tiling import MERGE_METHODS, check_tiling, submit_tiled
+
+# 0 keeps the service off in the GUI
+DEFAULT_HTTP_PORT = int(os.environ.get("NEUROVISION_HTTP_PORT", "0"))
+DEFAULT_MAX_CONCURRENT = int(os.environ.get("NEUROVISION_HTTP_CONCURRENCY", "0")) or 2 * DEFAULT_WORKERS
+
+# Largest accepted upload; big enough for multi-frame DICOM
+MAX_UPLOAD_BYTES = 512 * 1024 * 1024
+
+
+class ServiceError(Exception):
+    def __init__(self, status, message, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class DetectionService:
+    """HTTP front end for an InferencePool.
+
+    get_pool() returns the pool to use for each request, so the GUI can replace
+    its pool (backend switch, model reload) while the service keeps running.
+    At most max_concurrent requests are decoded and detected at once; the rest
+    wait up to queue_timeout seconds and are then answered with 503.
+    """
+
+    def __init__(self, get_pool, host="127.0.0.1", port=8765, max_concurrent=DEFAULT_MAX_CONCURRENT,
+                 queue_timeout=30.0, request_timeout=120.0, conf=0.25):
+        self.get_pool = get_pool
+        self.max_concurrent = max(1, max_concurrent)
+        self.queue_timeout = queue_timeout
+        self.request_timeout = request_timeout
+        self.conf = conf
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._served = 0
+
+        handler = type("Handler", (_RequestHandler,), {"service": self})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def address(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="http-service", daemon=True)
+        self._thread.start()
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def health(self):
+        pool = self.get_pool()
+        with self._lock:
+            in_flight, served = self._in_flight, self._served
+        return {
+            "state": pool.state if pool is not None else "stopped",
+            "weights": getattr(pool, "weights", None),
+            "backend": getattr(pool, "backend", None),
+            "precision": getattr(pool, "precision", None),
+            "imgsz": getattr(pool, "imgsz", None),
+            "in_flight": in_flight,
+            "max_concurrent": self.max_concurrent,
+            "served": served,
+            "batching": pool.batch_stats.summary() if pool is not None else None,
+        }
+
+    def detect(self, load_pixels, name, query):
+        """Decode and detect one scan; returns (record, timings in ms)"""
+        # Check the parameters before the request takes a slot or decodes anything
+        conf = _float_param(query, "conf", self.conf)
+        if not 0 <= conf <= 1:
+            raise ServiceError(400, "conf must be between 0 and 1")
+        tile = int(_float_param(query, "tile", 0))
+        overlap = _float_param(query, "tile_overlap", 0.2)
+        method = query.get("tile_merge", ["wbf"])[0]
+        if method not in MERGE_METHODS:
+            raise ServiceError(400, f"tile_merge must be one of {', '.join(MERGE_METHODS)}")
+        if tile:
+            try:
+                check_tiling(tile, overlap)
+            except ValueError as e:
+                raise ServiceError(400, str(e))
+
+        timings = {}
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise ServiceError(503, "Too many requests in progress", retry_after=1)
+        timings["queue"] = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            self._in_flight += 1
+        try:
+            pool = self.get_pool()
+            if pool is None or pool.state != "ready":
+                raise ServiceError(503, f"Model is {pool.state if pool is not None else 'not loaded'}",
+                                   retry_after=5)
+
+            stage = time.perf_counter()
+            try:
+                scan = ScanImage(name, pixels=load_pixels())
+            except FileNotFoundError as e:
+                raise ServiceError(404, str(e))
+            except Exception as e:
+                raise ServiceError(400, f"Could not decode {name}: {e}")
+            timings["decode"] = (time.perf_counter() - stage) * 1000
+
+            try:
+                stage = time.perf_counter()
+                if tile and max(scan.shape) > tile:
+                    try:
+                        future = submit_tiled(pool, scan.pixels, conf=conf, tile=tile, overlap=overlap,
+                                              method=method)
+                    except ValueError as e:
+                        # Too many tiles for this scan at the requested size
+                        raise ServiceError(400, str(e))
+                else:
+                    model_input, letterbox = scan.model_input(pool.imgsz)
+                    future = pool.submit(model_input, conf=conf, letterbox=letterbox)
+                timings["letterbox"] = (time.perf_counter() - stage) * 1000
+
+                stage = time.perf_counter()
+                record = future.result(timeout=self.request_timeout)
+                timings["inference"] = (time.perf_counter() - stage) * 1000
+            except FutureTimeoutError:
+                raise ServiceError(504, "Detection timed out")
+            except RuntimeError as e:
+                # The pool was stopped or replaced while the request was queued
+                raise ServiceError(503, str(e), retry_after=5)
+            for stage_name, ms in record.get("stages_ms", {}).items():
+                timings[f"server-{stage_name}"] = ms
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._served += 1
+            self._slots.release()
+
+        record["source"] = name
+        record["model"] = {"weights": pool.weights, "backend": pool.backend, "precision": pool.precision,
+                           "imgsz": pool.imgsz}
+        return record, timings
+
+
+def _float_param(query, name, default):
+    try:
+        value = float(query.get(name, [default])[0])
+    except ValueError:
+        value = math.nan
+    # float() accepts "nan" and "inf", which no parameter here can use
+    if not math.isfinite(value):
+        raise ServiceError(400, f"{name} must be a number")
+    return value
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    service = None
+    protocol_version = "HTTP/1.1"
+    server_version = "NeuroVision"
+
+    def do_GET(self):
+        if urlparse(self.path).path != "/health":
+            return self._send_json(404, {"error": "Not found"})
+        self._send_json(200, self.service.health())
+
+    def do_POST(self):
+        start = time.perf_counter()
+        url = urlparse(self.path)
+        if url.path != "/detect":
+            return self._send_json(404, {"error": "Not found"})
+
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length <= 0:
+                raise ServiceError(411, "Send the scan (or a JSON body with a path) with a Content-Length")
+            if length > MAX_UPLOAD_BYTES:
+                raise ServiceError(413, f"Uploads are limited to {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+            stage = time.perf_counter()
+            body = self.rfile.read(length)
+            read_ms = (time.perf_counter() - stage) * 1000
+
+            query = parse_qs(url.query)
+            if self.headers.get_content_type() == "application/json":
+                try:
+                    path = json.loads(body)["path"]
+                except (ValueError, KeyError, TypeError):
+                    path = None
+                if not isinstance(path, str) or not path:
+                    raise ServiceError(400, 'Expected a JSON body like {"path": "/scans/case1.dcm"}')
+                if not os.path.isfile(path):
+                    raise ServiceError(404, f"{path} does not exist")
+                record, timings = self.service.detect(lambda: decode_scan(path), path, query)
+            else:
+                name = query.get("name", ["upload"])[0]
+                record, timings = self.service.detect(lambda: decode_scan_bytes(body), name, query)
+            timings = dict(read=read_ms, **timings)
+        except ServiceError as e:
+            headers = {"Retry-After": str(e.retry_after)} if e.retry_after else {}
+            return self._send_json(e.status, {"error": str(e)}, headers)
+
+        timings["total"] = (time.perf_counter() - start) * 1000
+        self._send_json(200, record, {
+            "Server-Timing": ", ".join(f"{name};dur={ms:.1f}" for name, ms in timings.items()),
+        })
+
+    def _send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # One line per request on stderr, without the default's reverse DNS lookup
+        sys.stderr.write(f"{self.address_string()} - {format % args}\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="NeuroVision AI local HTTP detection service (no GUI)")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="Address to listen on; anything but localhost exposes scans on the network")
+    parser.add_argument("--port", type=int, default=DEFAULT_HTTP_PORT or 8765)
+    parser.add_argument("--weights", default=DEFAULT_WEIGHTS, help="YOLOv8 weights file or registered model name")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Inference worker processes")
+    parser.add_argument("--imgsz", type=int, default=640, help="Inference image size")
+    parser.add_argument("--backend", choices=list(BACKENDS), default=DEFAULT_BACKEND)
+    parser.add_argument("--precision", choices=list(PRECISIONS), default=DEFAULT_PRECISION)
+    parser.add_argument("--calibration", default=DEFAULT_CALIBRATION,
+                        help="Folder of scans for static INT8 calibration")
+    parser.add_argument("--max-concurrent", type=int, default=DEFAULT_MAX_CONCURRENT,
+                        help="Requests decoded and detected at once; others wait")
+    parser.add_argument("--conf", type=float, default=0.25, help="Default confidence threshold")
+    args = parser.parse_args(argv)
+
+    pool = InferencePool(resolve_weights(args.weights), args.workers, args.imgsz, backend=args.backend,
+                         precision=args.precision, calibration=args.calibration)
+    pool.start()
+    service = DetectionService(lambda: pool, args.host, args.port, args.max_concurrent, conf=args.conf)
+    print(f"Serving detections on {service.address} (model loading, /health reports when ready)",
+          file=sys.stderr)
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
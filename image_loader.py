@@ -0,0 +1,227 @@
+import io
+import os
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from result_cache import hash_pixels
+
+# DICOM support is optional (pydicom + pylibjpeg codecs from requirements.txt)
+try:
+    import pydicom
+except ImportError:
+    pydicom = None
+
+DICOM_EXTENSIONS = (".dcm", ".dicom")
+
+# PIL modes holding more than 8 bits per pixel
+HIGH_BIT_MODES = ("I;16", "I;16B", "I;16L", "I;16N", "I", "F")
+
+# Resolution levels an encoder writes by default (OpenJPEG and Kakadu use 5)
+JPEG2000_MAX_REDUCE = 5
+
+
+def is_dicom(path):
+    if path.lower().endswith(DICOM_EXTENSIONS):
+        return True
+    # DICOM files may have no extension; check for the DICM magic after the preamble
+    try:
+        with open(path, "rb") as f:
+            f.seek(128)
+            return f.read(4) == b"DICM"
+    except OSError:
+        return False
+
+
+def apply_window(pixels, center, width):
+    """Map pixels in [center - width/2, center + width/2] to 0-255 uint8 in one pass"""
+    width = max(float(width), 1.0)
+    low = float(center) - width / 2.0
+
+    scaled = np.subtract(pixels, low, dtype=np.float32)
+    scaled *= 255.0 / width
+    np.clip(scaled, 0, 255, out=scaled)
+    return scaled.astype(np.uint8)
+
+
+def auto_window(pixels):
+    """Window covering the full range of the data, used when a file carries none"""
+    low = float(pixels.min())
+    high = float(pixels.max())
+    return (low + high) / 2.0, max(high - low, 1.0)
+
+
+def _first_value(value):
+    # Window center/width can be multi-valued in DICOM; the first one is the default view
+    if isinstance(value, (list, tuple)) or getattr(value, "VM", 1) > 1:
+        return float(value[0])
+    return float(value)
+
+
+def read_dicom(path, frame=0):
+    """Decode a DICOM file (any transfer syntax pydicom/pylibjpeg can handle) to uint8"""
+    if pydicom is None:
+        raise RuntimeError("DICOM support needs pydicom: pip install pydicom pylibjpeg")
+
+    ds = pydicom.dcmread(path, stop_before_pixels=True)
+    frames = int(getattr(ds, "NumberOfFrames", 1) or 1)
+    if hasattr(path, "seek"):
+        path.seek(0)
+    if frames > 1 and hasattr(pydicom, "pixels") and hasattr(pydicom.pixels, "pixel_array"):
+        # pydicom 3 reads and decodes just the requested frame from the file
+        pixels = pydicom.pixels.pixel_array(path, index=frame)
+    else:
+        ds = pydicom.dcmread(path)
+        pixels = ds.pixel_array
+        if frames > 1:
+            pixels = pixels[frame]
+
+    # Colour DICOM (pixel_array already converts YBR to RGB)
+    if getattr(ds, "SamplesPerPixel", 1) == 3:
+        return np.ascontiguousarray(pixels, dtype=np.uint8)
+
+    # Rescale slope/intercept (modality LUT) without an extra float copy when it is the identity
+    slope = float(getattr(ds, "RescaleSlope", 1) or 1)
+    intercept = float(getattr(ds, "RescaleIntercept", 0) or 0)
+    if slope != 1 or intercept != 0:
+        pixels = pixels.astype(np.float32)
+        pixels *= slope
+        pixels += intercept
+
+    if "WindowCenter" in ds and "WindowWidth" in ds:
+        center, width = _first_value(ds.WindowCenter), _first_value(ds.WindowWidth)
+    else:
+        center, width = auto_window(pixels)
+
+    image = apply_window(pixels, center, width)
+
+    # MONOCHROME1 stores inverted intensities
+    if getattr(ds, "PhotometricInterpretation", "") == "MONOCHROME1":
+        np.subtract(255, image, out=image)
+    return image
+
+
+def decode_scan(path):
+    """Decode any supported scan to uint8: HxW for grayscale, HxWx3 RGB for colour"""
+    if is_dicom(path):
+        return read_dicom(path)
+    return _decode_image(path)
+
+
+def decode_scan_bytes(data):
+    """decode_scan for an encoded file held in memory, e.g. an HTTP upload"""
+    if data[128:132] == b"DICM":
+        return read_dicom(io.BytesIO(data))
+    return _decode_image(io.BytesIO(data))
+
+
+def _decode_image(source):
+    with Image.open(source) as img:
+        if img.mode in HIGH_BIT_MODES:
+            # 16-bit PNG/TIFF: window over the full range instead of truncating to 8 bits
+            pixels = np.asarray(img)
+            return apply_window(pixels, *auto_window(pixels))
+        if img.mode == "L":
+            return np.asarray(img)
+        return np.asarray(img.convert("RGB"))
+
+
+def load_draft_preview(path, size=(400, 400)):
+    """Fast low-resolution preview using scale-on-decode, or None if the format has no such path.
+
+    JPEG is decoded by libjpeg directly at 1/2, 1/4 or 1/8 scale and JPEG 2000 at a
+    reduced resolution level, so a large export previews in a fraction of a full decode.
+    """
+    if is_dicom(path):
+        return None
+
+    with Image.open(path) as img:
+        if img.format == "JPEG":
+            img.draft("L" if img.mode == "L" else "RGB", size)
+        elif img.format == "JPEG2000":
+            factor = max(1, min(img.width // size[0], img.height // size[1]))
+            # Decode only up to the resolution level (log2 of the reduction) that still
+            # covers the preview size; img.reduce() would decode everything first
+            img.reduce = min(factor.bit_length() - 1, JPEG2000_MAX_REDUCE)
+            try:
+                img.load()
+            except OSError:
+                # Fewer resolution levels in the codestream than asked for
+                return None
+        else:
+            return None
+        return img.convert("RGB").resize(size, Image.Resampling.BILINEAR)
+
+
+def to_model_input(pixels):
+    """HxWx3 BGR uint8, the layout ultralytics expects for numpy sources"""
+    if pixels.ndim == 2:
+        return cv2.cvtColor(pixels, cv2.COLOR_GRAY2BGR)
+    return cv2.cvtColor(pixels, cv2.COLOR_RGB2BGR)
+
+
+def to_pil(pixels):
+    """PIL image for display; grayscale stays single-channel until Tk needs it"""
+    return Image.fromarray(pixels)
+
+
+def open_scan_image(path):
+    """PIL RGB image of a scan, for code that only needs something to show"""
+    return to_pil(decode_scan(path)).convert("RGB")
+
+
+def letterbox(pixels, imgsz=640, color=114):
+    """Resize keeping aspect ratio and pad to imgsz x imgsz, returning (bgr, scale, (pad_x, pad_y))"""
+    height, width = pixels.shape[:2]
+    scale = min(imgsz / height, imgsz / width)
+    new_w, new_h = max(1, round(width * scale)), max(1, round(height * scale))
+
+    # Resize before the colour conversion so only the small image is converted
+    resized = cv2.resize(pixels, (new_w, new_h), interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR)
+    bgr = to_model_input(resized)
+
+    pad_x, pad_y = (imgsz - new_w) // 2, (imgsz - new_h) // 2
+    boxed = cv2.copyMakeBorder(bgr, pad_y, imgsz - new_h - pad_y, pad_x, imgsz - new_w - pad_x,
+                               cv2.BORDER_CONSTANT, value=(color, color, color))
+    return boxed, scale, (pad_x, pad_y)
+
+
+class ScanImage:
+    """A scan decoded once, with the derived views the preview, model and overlays need"""
+
+    def __init__(self, path, pixels=None):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.pixels = decode_scan(path) if pixels is None else pixels
+        self._previews = {}
+        self._model_inputs = {}
+        self._pixel_hash = None
+        self.trace_id = None
+
+    @property
+    def shape(self):
+        return self.pixels.shape[:2]
+
+    def preview(self, size=(400, 400)):
+        """RGB PIL image at display size, resized from the decoded pixels (cached)"""
+        if size not in self._previews:
+            img = to_pil(self.pixels).resize(size)
+            self._previews[size] = img if img.mode == "RGB" else img.convert("RGB")
+        return self._previews[size]
+
+    def model_input(self, imgsz=640):
+        """Letterboxed BGR array for the model plus the mapping back to the original (cached)"""
+        if imgsz not in self._model_inputs:
+            boxed, scale, pad = letterbox(self.pixels, imgsz)
+            self._model_inputs[imgsz] = (boxed, {
+                "scale": scale,
+                "pad": pad,
+                "orig_shape": list(self.shape),
+            })
+        return self._model_inputs[imgsz]
+
+    def pixel_hash(self):
+        if self._pixel_hash is None:
+            self._pixel_hash = hash_pixels(self.pixels)
+        return self._pixel_hash
@@ -0,0 +1,565 @@
+"""
+NeuroVision AI - out-of-process inference server
+
+The GUI talks to a separate server process so torch never competes with the
+Tk mainloop for the GIL. The server loads the YOLOv8 weights once and forks a
+pool of workers that share them copy-on-write (on platforms without fork each
+worker loads its own copy). Jobs are sent over an authenticated local
+connection; image arrays travel through shared memory instead of being pickled.
+
+Arrays passed to InferencePool.submit() must be HxWx3 uint8 in BGR order, the
+same layout ultralytics expects for numpy sources.
+"""
+import argparse
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import secrets
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+from backends import BACKENDS, PRECISIONS, prepare_weights
+from detector import DEFAULT_WEIGHTS, load_model, warm_up, result_to_record, unletterbox_record
+from stats import BatchStats
+
+# Number of worker processes, sized to the machine unless NEUROVISION_WORKERS is set
+DEFAULT_WORKERS = int(os.environ.get("NEUROVISION_WORKERS", "0")) or max(1, (os.cpu_count() or 1) // 4)
+
+# Micro-batching: a worker that picks up a job waits this long for more jobs to run
+# in the same forward pass, up to MAX_BATCH images (1 turns batching off)
+MAX_BATCH = int(os.environ.get("NEUROVISION_MAX_BATCH", "8"))
+MAX_BATCH_DELAY_MS = float(os.environ.get("NEUROVISION_BATCH_DELAY_MS", "5"))
+
+# How often the server checks its workers, and how many crashed workers it replaces
+WORKER_CHECK_INTERVAL = 0.5
+MAX_WORKER_RESTARTS = 3
+
+
+class InferencePool:
+    """Client side of the inference server, used from the GUI process"""
+
+    def __init__(self, weights=DEFAULT_WEIGHTS, workers=DEFAULT_WORKERS, imgsz=640, on_state=None,
+                 backend="pytorch", precision="fp32", calibration=None, max_batch=MAX_BATCH,
+                 max_batch_delay_ms=MAX_BATCH_DELAY_MS):
+        self.weights = weights
+        self.backend = backend
+        self.precision = precision
+        self.calibration = calibration
+        self.workers = max(1, workers)
+        self.imgsz = imgsz
+        self.max_batch = max(1, max_batch)
+        self.max_batch_delay_ms = max(0.0, max_batch_delay_ms)
+        self.on_state = on_state
+        self.state = "stopped"
+        self.ready_workers = 0
+        self.batch_stats = BatchStats()
+
+        self._authkey = secrets.token_bytes(32)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._conn = None
+        self._listener = None
+        self._address = None
+        self._process = None
+
+    def start(self):
+        self._listener = Listener(("127.0.0.1", 0), authkey=self._authkey)
+        self._address = self._listener.address
+        host, port = self._address
+        env = dict(os.environ, NEUROVISION_AUTHKEY=self._authkey.hex())
+        command = [sys.executable, os.path.abspath(__file__),
+                   "--connect", f"{host}:{port}",
+                   "--weights", self.weights,
+                   "--workers", str(self.workers),
+                   "--imgsz", str(self.imgsz),
+                   "--backend", self.backend,
+                   "--precision", self.precision,
+                   "--max-batch", str(self.max_batch),
+                   "--batch-delay-ms", str(self.max_batch_delay_ms)]
+        if self.calibration:
+            command += ["--calibration", self.calibration]
+        self._process = subprocess.Popen(command, env=env)
+        self._set_state("loading")
+
+        threading.Thread(target=self._listen, daemon=True).start()
+        threading.Thread(target=self._watch_process, daemon=True).start()
+
+    def submit(self, source, conf=0.25, imgsz=None, letterbox=None):
+        """Queue one scan (file path or BGR array) and return a Future of its detection record.
+
+        Pass the letterbox mapping from ScanImage.model_input() when the array is already
+        letterboxed, so boxes come back in original coordinates. Overlays are drawn by the
+        caller from the record (see overlay.py).
+        """
+        payload, shms = _make_payload(source)
+        return self._send_job(payload, shms, conf, imgsz, letterbox)
+
+    def submit_batch(self, sources, conf=0.25, imgsz=None):
+        """Queue several scans as one batched forward pass; the Future holds a list of records"""
+        payloads = []
+        shms = []
+        for source in sources:
+            payload, source_shms = _make_payload(source)
+            payloads.append(payload)
+            shms.extend(source_shms)
+        return self._send_job(("batch", payloads), shms, conf, imgsz)
+
+    def _send_job(self, payload, shms, conf, imgsz, letterbox=None):
+        if self._conn is None or self.state in ("stopped", "failed"):
+            for shm in shms:
+                _release_shared_memory(shm)
+            raise RuntimeError("Inference server is not running")
+
+        future = Future()
+        job_id = next(self._ids)
+        params = {
+            "conf": conf,
+            "imgsz": imgsz or self.imgsz,
+            "letterbox": letterbox,
+        }
+
+        with self._lock:
+            self._pending[job_id] = (future, shms)
+            try:
+                self._conn.send(("detect", job_id, payload, params))
+            except (OSError, EOFError) as e:
+                self._pending.pop(job_id)
+                for shm in shms:
+                    _release_shared_memory(shm)
+                raise RuntimeError(f"Inference server is not reachable: {e}")
+        return future
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def shutdown(self, timeout=5):
+        self._set_state("stopped")
+        if self._conn is not None:
+            try:
+                with self._lock:
+                    self._conn.send(("shutdown", None, None, None))
+            except (OSError, EOFError):
+                pass
+        if self._process is not None:
+            try:
+                self._process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        self._fail_pending("Inference server stopped")
+
+    def _set_state(self, state):
+        if self.state == state and state != "ready":
+            return
+        if self.state == "stopped" and state != "loading":
+            return
+        self.state = state
+        if self.on_state:
+            self.on_state(state)
+
+    def _listen(self):
+        try:
+            conn = self._listener.accept()
+        except OSError:
+            return
+        finally:
+            self._listener.close()
+
+        # The watcher connects to unblock accept() when the server dies before connecting
+        if self._process.poll() is not None:
+            conn.close()
+            return
+        self._conn = conn
+
+        while True:
+            try:
+                kind, job_id, data = conn.recv()
+            except (EOFError, OSError):
+                break
+
+            if kind == "state":
+                if data == "ready":
+                    self.ready_workers += 1
+                self._set_state(data)
+                continue
+            if kind == "worker_lost":
+                # The server fails the worker's jobs itself and replaces it if it can
+                print(data, file=sys.stderr)
+                self.ready_workers = max(0, self.ready_workers - 1)
+                self._set_state(self.state)
+                continue
+
+            with self._lock:
+                future, shms = self._pending.pop(job_id, (None, []))
+            for shm in shms:
+                _release_shared_memory(shm)
+
+            if future is None:
+                continue
+            if kind == "result":
+                for record in data if isinstance(data, list) else [data]:
+                    self.batch_stats.add(record)
+                future.set_result(data)
+            else:
+                future.set_exception(RuntimeError(data))
+
+        self._fail_pending("Inference server stopped")
+
+    def _watch_process(self):
+        self._process.wait()
+        if self._conn is None:
+            try:
+                Client(self._address, authkey=self._authkey).close()
+            except OSError:
+                pass
+        if self.state != "stopped":
+            self._set_state("failed")
+        self._fail_pending(f"Inference server exited with code {self._process.returncode}")
+
+    def _fail_pending(self, message):
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for future, shms in pending:
+            for shm in shms:
+                _release_shared_memory(shm)
+            if not future.done():
+                future.set_exception(RuntimeError(message))
+
+
+def _make_payload(source):
+    """Describe a source for the server: arrays go through shared memory, paths as-is"""
+    if isinstance(source, np.ndarray):
+        shm = shared_memory.SharedMemory(create=True, size=max(1, source.nbytes))
+        np.ndarray(source.shape, dtype=source.dtype, buffer=shm.buf)[...] = source
+        return ("shm", shm.name, source.shape, source.dtype.str), [shm]
+    return ("path", os.fspath(source)), []
+
+
+def _release_shared_memory(shm):
+    shm.close()
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _attach_shared_memory(name):
+    shm = shared_memory.SharedMemory(name=name)
+    # The GUI owns the segment; stop this process's resource tracker from unlinking it on exit
+    if os.name == "posix":
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+def _read_payload(payload):
+    if payload[0] == "shm":
+        _, name, shape, dtype = payload
+        shm = _attach_shared_memory(name)
+        try:
+            # Copy out so results never keep a view into a segment the GUI is about to free
+            return np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf).copy()
+        finally:
+            shm.close()
+    return payload[1]
+
+
+def _job_size(payload):
+    return len(payload[1]) if payload[0] == "batch" else 1
+
+
+def _collect_jobs(requests, first, max_batch, max_delay):
+    """The first job plus whatever arrives within max_delay seconds, up to max_batch images.
+
+    Returns (jobs, stop); stop is True when the shutdown marker was taken off the queue.
+    """
+    jobs = [first]
+    size = _job_size(first[1])
+    deadline = time.monotonic() + max_delay
+    while size < max_batch:
+        timeout = deadline - time.monotonic()
+        try:
+            # Past the deadline, still take jobs that are already waiting
+            job = requests.get(timeout=timeout) if timeout > 0 else requests.get_nowait()
+        except queue.Empty:
+            break
+        if job is None:
+            return jobs, True
+        jobs.append(job)
+        size += _job_size(job[1])
+    return jobs, False
+
+
+def _run_batch(model, jobs):
+    """One forward pass over the images of jobs sharing conf and imgsz; returns each job's result"""
+    read_start = time.perf_counter()
+    sources = []
+    counts = []
+    for _, payload, _, _ in jobs:
+        job_sources = [_read_payload(p) for p in payload[1]] if payload[0] == "batch" else [_read_payload(payload)]
+        sources.extend(job_sources)
+        counts.append(len(job_sources))
+    read_ms = (time.perf_counter() - read_start) * 1000 / len(sources)
+
+    params = jobs[0][2]
+    batch_start = time.monotonic()
+    start_time = time.perf_counter()
+    results = model(sources, conf=params["conf"], imgsz=params["imgsz"], verbose=False)
+    elapsed = time.perf_counter() - start_time
+
+    outputs = []
+    index = 0
+    for (_, payload, params, received), count in zip(jobs, counts):
+        records = []
+        for result in results[index:index + count]:
+            record = result_to_record(result)
+            record["time_taken"] = round(elapsed / len(sources), 4)
+            record["batch_size"] = len(sources)
+            if params.get("letterbox"):
+                unletterbox_record(record, params["letterbox"])
+
+            # Per-stage timings for the GUI's tracer; ultralytics times pre/inference/NMS itself
+            speed = record["speed_ms"]
+            record["stages_ms"] = {
+                "queue": round((batch_start - received) * 1000, 3),
+                "shm_read": round(read_ms, 3),
+                "preprocess": speed.get("preprocess", 0.0),
+                "forward": speed.get("inference", 0.0),
+                "nms": speed.get("postprocess", 0.0),
+            }
+            records.append(record)
+        index += count
+        outputs.append(records if payload[0] == "batch" else records[0])
+    return outputs
+
+
+def _run_jobs(model, jobs, responses):
+    """Run collected jobs batched by (imgsz, conf) and send every job its own result"""
+    groups = {}
+    for job in jobs:
+        params = job[2]
+        groups.setdefault((params["imgsz"], params["conf"]), []).append(job)
+
+    for group in groups.values():
+        try:
+            outputs = _run_batch(model, group)
+        except Exception as e:
+            if len(group) == 1:
+                responses.put(("error", group[0][0], str(e)))
+                continue
+            # One bad scan should not fail the others it was batched with
+            for job in group:
+                _run_jobs(model, [job], responses)
+            continue
+        for job, output in zip(group, outputs):
+            responses.put(("result", job[0], output))
+
+
+def _worker_main(model, imgsz, threads, requests, responses, backend="pytorch", precision="fp32",
+                 max_batch=1, max_batch_delay_ms=0.0):
+    import torch
+    torch.set_num_threads(threads)
+
+    try:
+        if isinstance(model, str):
+            model = load_model(model, backend, imgsz, precision)
+        warm_up(model, imgsz)
+    except Exception as e:
+        responses.put(("state", os.getpid(), "failed"))
+        print(f"Inference worker failed to start: {e}", file=sys.stderr)
+        return
+    responses.put(("state", os.getpid(), "ready"))
+
+    stop = False
+    while not stop:
+        job = requests.get()
+        if job is None:
+            break
+        jobs, stop = _collect_jobs(requests, job, max_batch, max_batch_delay_ms / 1000)
+        # Lets the server answer these jobs if this worker dies while running them
+        responses.put(("taken", os.getpid(), [job[0] for job in jobs]))
+        _run_jobs(model, jobs, responses)
+
+
+def serve(address, authkey, weights, workers, imgsz, backend="pytorch", precision="fp32", calibration=None,
+          max_batch=1, max_batch_delay_ms=0.0):
+    """Server process: load the weights once, fork the workers and relay jobs and results"""
+    conn = Client(address, authkey=authkey)
+    send_lock = threading.Lock()
+
+    def send(message):
+        with send_lock:
+            conn.send(message)
+
+    use_fork = "fork" in mp.get_all_start_methods()
+    ctx = mp.get_context("fork" if use_fork else "spawn")
+    requests = ctx.Queue()
+    responses = ctx.Queue()
+
+    try:
+        # Export/quantize once here so workers never race to write the same artifact
+        weights = prepare_weights(weights, backend, imgsz, precision, calibration)
+        # With fork the workers inherit loaded PyTorch weights copy-on-write; exported
+        # runtimes keep native thread pools that must be created after the fork
+        model = load_model(weights, backend, imgsz, precision) if use_fork and backend == "pytorch" else weights
+    except Exception as e:
+        print(f"Error loading model: {e}", file=sys.stderr)
+        send(("state", None, "failed"))
+        conn.close()
+        return 1
+
+    send(("state", None, "warming"))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+
+    def start_worker():
+        process = ctx.Process(target=_worker_main, args=(model, imgsz, threads, requests, responses, backend,
+                                                         precision, max_batch, max_batch_delay_ms),
+                              daemon=True)
+        process.start()
+        return process
+
+    processes = [start_worker() for _ in range(workers)]
+
+    # Jobs each worker has taken and not answered yet, and the workers that loaded the model
+    workers_lock = threading.Lock()
+    taken = {}
+    owners = {}
+    ready_pids = set()
+
+    def forward_responses():
+        while True:
+            message = responses.get()
+            if message is None:
+                break
+            kind, job_id, data = message
+            with workers_lock:
+                if kind == "taken":
+                    taken.setdefault(job_id, set()).update(data)
+                    owners.update(dict.fromkeys(data, job_id))
+                    continue
+                if kind == "state":
+                    if data == "failed":
+                        # The pool only fails once no worker is left; see check_workers()
+                        continue
+                    ready_pids.add(job_id)
+                    message = ("state", None, data)
+                else:
+                    taken.get(owners.pop(job_id, None), set()).discard(job_id)
+            try:
+                send(message)
+            except (OSError, EOFError):
+                break
+
+    forwarder = threading.Thread(target=forward_responses, daemon=True)
+    forwarder.start()
+
+    restarts = 0
+    failed = False
+    exited = set()
+
+    def check_workers():
+        """Answer the jobs of workers that died, replace them and fail the pool once none are left"""
+        nonlocal restarts, failed
+        for index, process in enumerate(processes):
+            if process.is_alive() or process.exitcode is None:
+                continue
+            if process.pid not in exited:
+                # Give the forwarder one interval to pass on what the worker sent before it died
+                exited.add(process.pid)
+                continue
+            with workers_lock:
+                lost_jobs = taken.pop(process.pid, set())
+                for job_id in lost_jobs:
+                    owners.pop(job_id, None)
+                was_ready = process.pid in ready_pids
+                ready_pids.discard(process.pid)
+            message = f"Inference worker {process.pid} exited with code {process.exitcode}"
+            for job_id in lost_jobs:
+                send(("error", job_id, message))
+            if not was_ready:
+                # Failed to load the model; starting it again would fail the same way
+                processes[index] = None
+                continue
+            send(("worker_lost", None, message))
+            if restarts < MAX_WORKER_RESTARTS:
+                restarts += 1
+                processes[index] = start_worker()
+            else:
+                processes[index] = None
+        processes[:] = [process for process in processes if process is not None]
+        if not processes and not failed:
+            failed = True
+            send(("state", None, "failed"))
+        if failed:
+            # Nothing is left to take the queued jobs
+            while True:
+                try:
+                    job = requests.get_nowait()
+                except queue.Empty:
+                    break
+                send(("error", job[0], "No inference workers are running"))
+
+    next_check = time.monotonic() + WORKER_CHECK_INTERVAL
+    while True:
+        try:
+            # Checked on a timer so a busy connection does not hide a dead worker
+            if time.monotonic() >= next_check:
+                check_workers()
+                next_check = time.monotonic() + WORKER_CHECK_INTERVAL
+            if not conn.poll(WORKER_CHECK_INTERVAL):
+                continue
+            kind, job_id, payload, params = conn.recv()
+        except (EOFError, OSError):
+            break
+        if kind == "shutdown":
+            break
+        if failed:
+            send(("error", job_id, "No inference workers are running"))
+            continue
+        requests.put((job_id, payload, params, time.monotonic()))
+
+    for _ in processes:
+        requests.put(None)
+    for process in processes:
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+    responses.put(None)
+    forwarder.join(timeout=1)
+    conn.close()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="NeuroVision AI inference server")
+    parser.add_argument("--connect", required=True, help="host:port of the GUI listener")
+    parser.add_argument("--weights", default=DEFAULT_WEIGHTS)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--backend", choices=list(BACKENDS), default="pytorch")
+    parser.add_argument("--precision", choices=list(PRECISIONS), default="fp32")
+    parser.add_argument("--calibration", help="Folder of scans for static INT8 calibration")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH,
+                        help="Most images a worker runs in one forward pass (1 = no micro-batching)")
+    parser.add_argument("--batch-delay-ms", type=float, default=MAX_BATCH_DELAY_MS,
+                        help="How long a worker waits for more jobs to batch with the first one")
+    args = parser.parse_args(argv)
+
+    host, port = args.connect.rsplit(":", 1)
+    authkey = bytes.fromhex(os.environ["NEUROVISION_AUTHKEY"])
+    return serve((host, int(port)), authkey, args.weights, max(1, args.workers), args.imgsz,
+                 args.backend, args.precision, args.calibration, max(1, args.max_batch), args.batch_delay_ms)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+import itertools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+# Set NEUROVISION_TRACE to a file path to write a Chrome trace (chrome://tracing, Perfetto) on exit
+TRACE_PATH = os.environ.get("NEUROVISION_TRACE")
+
+
+class Tracer:
+    """Per-stage timing for the detection pipeline using the high-resolution perf counter.
+
+    Every stage becomes a complete ("X") event in Chrome trace format and is also
+    added to a per-scan breakdown for on-screen display. Events are held in a
+    bounded ring buffer so tracing can stay on for a whole shift.
+    """
+
+    def __init__(self, trace_path=TRACE_PATH, max_events=200000, max_scans=100):
+        self.trace_path = trace_path
+        self._events = deque(maxlen=max_events)
+        self._breakdowns = OrderedDict()
+        self._max_scans = max_scans
+        self._scan_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._origin_ns = time.perf_counter_ns()
+        self._pid = os.getpid()
+
+    def new_scan(self):
+        return next(self._scan_ids)
+
+    @contextmanager
+    def stage(self, name, scan=None, **args):
+        start_ns = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.add(name, start_ns, time.perf_counter_ns() - start_ns, scan=scan, **args)
+
+    def add(self, name, start_ns, duration_ns, scan=None, track=None, **args):
+        """Record a stage that was timed elsewhere (e.g. in the inference server)"""
+        event = {
+            "name": name,
+            "cat": "detection",
+            "ph": "X",
+            "ts": (start_ns - self._origin_ns) / 1000.0,
+            "dur": duration_ns / 1000.0,
+            "pid": self._pid,
+            "tid": track or threading.current_thread().name,
+            "args": dict(args, scan=scan) if scan is not None else args,
+        }
+        with self._lock:
+            self._events.append(event)
+            if scan is not None:
+                stages = self._breakdowns.setdefault(scan, OrderedDict())
+                stages[name] = stages.get(name, 0.0) + duration_ns / 1e6
+                self._breakdowns.move_to_end(scan)
+                while len(self._breakdowns) > self._max_scans:
+                    self._breakdowns.popitem(last=False)
+
+    def add_remote_stages(self, stages_ms, start_ns, scan=None, track="inference server"):
+        """Lay out stage durations reported by another process back to back from start_ns"""
+        offset_ns = start_ns
+        for name, ms in stages_ms.items():
+            duration_ns = int(ms * 1e6)
+            self.add(name, offset_ns, duration_ns, scan=scan, track=track)
+            offset_ns += duration_ns
+
+    def breakdown(self, scan):
+        """Stage name -> milliseconds for one scan, in the order the stages ran"""
+        with self._lock:
+            return dict(self._breakdowns.get(scan, {}))
+
+    def breakdown_text(self, scan):
+        return " • ".join(f"{name} {ms:.0f}ms" for name, ms in self.breakdown(scan).items())
+
+    def write_chrome_trace(self, path=None):
+        path = path or self.trace_path
+        if not path:
+            return None
+        with self._lock:
+            events = list(self._events)
+
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return path
+
+
+# Shared tracer for the GUI and the command-line tools
+tracer = Tracer()
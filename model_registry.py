@@ -0,0 +1,74 @@
+"""
+NeuroVision AI - model registry
+
+Named model versions (e.g. "v1", "v2-finetuned") mapped to their weights, kept
+in neurovision_models.json so the GUI can list them in the header and switch
+between them without a restart. Command-line tools accept a registered name
+wherever they take a weights path.
+"""
+import json
+import os
+from datetime import datetime
+
+from detector import DEFAULT_WEIGHTS
+
+REGISTRY_PATH = os.environ.get("NEUROVISION_MODELS", "neurovision_models.json")
+
+# Name of the entry created for the default weights when the registry is empty
+DEFAULT_MODEL = "default"
+
+
+class ModelRegistry:
+    """Name -> weights entries, saved as JSON next to the settings file"""
+
+    def __init__(self, path=REGISTRY_PATH, default_weights=DEFAULT_WEIGHTS):
+        self.path = path
+        self.models = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.models = json.load(f).get("models", {})
+        except (OSError, ValueError):
+            pass
+        if not self.models:
+            self.models[DEFAULT_MODEL] = {"weights": default_weights}
+
+    def names(self):
+        return list(self.models)
+
+    def weights(self, name):
+        """Weights path of a registered model; KeyError for unknown names"""
+        return self.models[name]["weights"]
+
+    def add(self, name, weights, description=""):
+        name = name.strip()
+        if not name:
+            raise ValueError("A model needs a name")
+        if not os.path.exists(weights):
+            raise ValueError(f"{weights} does not exist")
+        self.models[name] = {
+            "weights": os.path.abspath(weights),
+            "description": description,
+            "added": datetime.now().isoformat(timespec="seconds"),
+        }
+        self.save()
+
+    def remove(self, name):
+        if len(self.models) > 1:
+            self.models.pop(name, None)
+            self.save()
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"models": self.models}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def resolve_weights(name_or_path, path=REGISTRY_PATH):
+    """Weights for a registered model name, or the argument itself if it is not one"""
+    if os.path.exists(name_or_path):
+        return name_or_path
+    try:
+        return ModelRegistry(path).weights(name_or_path)
+    except KeyError:
+        return name_or_path
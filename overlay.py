@@ -0,0 +1,137 @@
+"""
+NeuroVision AI - detection overlay rendering
+
+Draws detection boxes and labels straight from the record arrays with OpenCV,
+at display resolution into a buffer that is reused between scans. The
+full-resolution overlay is only rendered when a result is exported.
+"""
+from functools import lru_cache
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Used when no theme is given (command-line tools)
+DEFAULT_COLORS = {"positive": "#e74c3c", "negative": "#27ae60", "bg": "#000000"}
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+# Negative panels up to this size (display previews) are cached; full-resolution exports are not
+MAX_CACHED_PANEL = 1024
+
+
+@lru_cache(maxsize=64)
+def hex_to_rgb(hex_color):
+    hex_color = hex_color.lstrip("#")
+    return tuple(int(hex_color[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def _as_rgb(image):
+    array = np.asarray(image)
+    if array.ndim == 2:
+        return cv2.cvtColor(array, cv2.COLOR_GRAY2RGB)
+    return array
+
+
+def _outlined_text(canvas, text, origin, scale, color, stroke, thickness=1):
+    cv2.putText(canvas, text, origin, FONT, scale, stroke, thickness + 2, cv2.LINE_AA)
+    cv2.putText(canvas, text, origin, FONT, scale, color, thickness, cv2.LINE_AA)
+
+
+def draw_boxes(canvas, record, scale_x, scale_y, theme=DEFAULT_COLORS, thickness=2, font_scale=0.4):
+    """Draw the record's boxes and labels onto an RGB uint8 canvas in place"""
+    color = hex_to_rgb(theme["positive"])
+    stroke = hex_to_rgb(theme.get("bg", "#000000"))
+    boxes = np.asarray(record["boxes"], dtype=np.float64).reshape(-1, 4) * (scale_x, scale_y, scale_x, scale_y)
+    corners = np.rint(boxes).astype(np.int32)
+
+    for (x1, y1, x2, y2), label, conf in zip(corners, record["labels"], record["confidences"]):
+        cv2.rectangle(canvas, (int(x1), int(y1)), (int(x2), int(y2)), color, thickness, cv2.LINE_AA)
+        text = f"{label} {conf:.2f}"
+        (_, text_h), _ = cv2.getTextSize(text, FONT, font_scale, 1)
+        y = int(y1) - 4 if y1 - 4 > text_h else int(y1) + text_h + 4
+        _outlined_text(canvas, text, (int(x1) + 2, y), font_scale, color, stroke, max(1, thickness // 2))
+    return canvas
+
+
+@lru_cache(maxsize=16)
+def _panel(height, width, color):
+    """Solid colour block the negative panel is blended with, reused across scans"""
+    panel = np.empty((height, width, 3), dtype=np.uint8)
+    panel[...] = color
+    panel.setflags(write=False)
+    return panel
+
+
+@lru_cache(maxsize=16)
+def _caption_layout(text, width, height):
+    font_scale = min(width, height) / 700
+    thickness = max(1, round(font_scale * 2))
+    (text_w, text_h), _ = cv2.getTextSize(text, FONT, font_scale, thickness)
+    origin = (width - text_w - round(width * 0.05), height - round(height * 0.05))
+    return font_scale, thickness, origin
+
+
+def draw_negative(canvas, theme=DEFAULT_COLORS, confidence=0.9, alpha=100 / 255):
+    """Tinted panel over the brain with a "No Tumor Detected" caption, drawn in place"""
+    height, width = canvas.shape[:2]
+    color = hex_to_rgb(theme["negative"])
+    stroke = hex_to_rgb("#000000" if theme.get("name") == "high_contrast" else theme.get("bg", "#000000"))
+
+    # Blend only the panel region instead of compositing a full-size RGBA layer
+    margin = max(1, round(min(width, height) * 0.075))
+    roi = canvas[margin:height - margin, margin:width - margin]
+    if max(roi.shape[:2]) <= MAX_CACHED_PANEL:
+        panel = _panel(roi.shape[0], roi.shape[1], color)
+    else:
+        panel = np.full_like(roi, color)
+    cv2.addWeighted(roi, 1 - alpha, panel, alpha, 0, dst=roi)
+    line = max(1, round(min(width, height) / 130))
+    cv2.rectangle(canvas, (margin, margin), (width - margin, height - margin), color, line)
+
+    text = f"No Tumor Detected ({confidence * 100:.0f}%)"
+    font_scale, thickness, origin = _caption_layout(text, width, height)
+    _outlined_text(canvas, text, origin, font_scale, color, stroke, thickness)
+    return canvas
+
+
+class OverlayRenderer:
+    """Renders detection results at display size, reusing one buffer per size"""
+
+    def __init__(self):
+        self._buffers = {}
+
+    def _buffer(self, base):
+        base = _as_rgb(base)
+        height, width = base.shape[:2]
+        buffer = self._buffers.get((width, height))
+        if buffer is None:
+            buffer = self._buffers[(width, height)] = np.empty((height, width, 3), dtype=np.uint8)
+        np.copyto(buffer, base)
+        return buffer
+
+    def render(self, base, record, theme=DEFAULT_COLORS):
+        """PIL image of the display-size base (e.g. the 400x400 preview) with the record drawn on it"""
+        canvas = self._buffer(base)
+        if record["regions"] > 0:
+            orig_h, orig_w = record["orig_shape"]
+            draw_boxes(canvas, record, canvas.shape[1] / orig_w, canvas.shape[0] / orig_h, theme)
+        else:
+            draw_negative(canvas, theme)
+        # The buffer is reused for the next scan, so the returned image owns a copy
+        return Image.frombytes("RGB", (canvas.shape[1], canvas.shape[0]), canvas.tobytes())
+
+    def render_negative(self, base, theme=DEFAULT_COLORS):
+        return self.render(base, {"regions": 0}, theme)
+
+
+def render_full(pixels, record, theme=DEFAULT_COLORS):
+    """Overlay at the scan's own resolution for export; record boxes are in original coordinates"""
+    canvas = _as_rgb(pixels).copy()
+    if record["regions"] > 0:
+        scale = max(canvas.shape[:2]) / 640
+        draw_boxes(canvas, record, 1.0, 1.0, theme, thickness=max(2, round(2 * scale)),
+                   font_scale=max(0.4, 0.5 * scale))
+    else:
+        draw_negative(canvas, theme)
+    return canvas
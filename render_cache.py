@@ -0,0 +1,45 @@
+from collections import OrderedDict
+
+from PIL import ImageOps
+
+
+class RenderCache:
+    """LRU of display-ready images keyed by (view, scan, theme, size).
+
+    Theme toggles and re-displays look the rendered image up here instead of
+    re-running the theme filters, the overlay and the PhotoImage conversion.
+    Only used from the Tk thread.
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key, render):
+        """Cached value for key, calling render() to build it on a miss"""
+        value = self._entries.get(key)
+        if value is None:
+            value = render()
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        self._entries.move_to_end(key)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+
+def themed_preview(img, theme_name):
+    """Theme-specific enhancement of an upload preview"""
+    if theme_name == "dark":
+        return ImageOps.autocontrast(img)
+    if theme_name == "high_contrast":
+        return ImageOps.invert(img)
+    return img
+
+
+def record_signature(record):
+    """Hashable summary of a detection record, for cache keys"""
+    return (tuple(map(tuple, record.get("boxes", []))), tuple(record.get("confidences", [])),
+            tuple(record.get("labels", [])))
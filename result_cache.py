@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Default location of the persistent cache, next to NeuroVision_Results
+DEFAULT_CACHE_DIR = "NeuroVision_Cache"
+
+
+def hash_pixels(array):
+    """Hash decoded pixel data, so the same scan under another name or format hits the cache"""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"{array.shape}|{array.dtype.str}".encode())
+    digest.update(np.ascontiguousarray(array).data)
+    return digest.hexdigest()
+
+
+_file_hashes = {}
+
+
+def hash_file(path, chunk_size=1 << 20):
+    """Hash a file (e.g. model weights), remembered per path/size/mtime"""
+    stat = os.stat(path)
+    cache_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if cache_key not in _file_hashes:
+        digest = hashlib.blake2b(digest_size=20)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        _file_hashes[cache_key] = digest.hexdigest()
+    return _file_hashes[cache_key]
+
+
+class ResultCache:
+    """Content-addressed detection results: in-memory LRU backed by a local on-disk store.
+
+    Keys combine the pixel hash, the model weights hash and the inference
+    parameters. Each entry is the detection record returned by the inference
+    pool; overlays are rendered from it on display, so no images are stored.
+    """
+
+    def __init__(self, weights_path, max_entries=256, cache_dir=DEFAULT_CACHE_DIR):
+        self.weights_path = weights_path
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._weights_hash = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def weights_hash(self):
+        if self._weights_hash is None:
+            try:
+                self._weights_hash = hash_file(self.weights_path)
+            except OSError:
+                # Weights are not readable from here, fall back to the path
+                self._weights_hash = hashlib.blake2b(self.weights_path.encode(), digest_size=20).hexdigest()
+        return self._weights_hash
+
+    def key(self, pixels, params):
+        pixel_hash = pixels if isinstance(pixels, str) else hash_pixels(pixels)
+        params_text = json.dumps(params, sort_keys=True)
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f"{pixel_hash}|{self.weights_hash()}|{params_text}".encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        entry = self._load(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, entry)
+        return entry
+
+    def put(self, key, record):
+        with self._lock:
+            self._remember(key, record)
+        try:
+            self._store(key, record)
+        except OSError as e:
+            print(f"Could not write cache entry {key}: {e}")
+
+    def stats_text(self):
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return f"cache {self.hits} hits / {self.misses} misses ({rate:.0f}%)"
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _paths(self, key):
+        folder = os.path.join(self.cache_dir, key[:2])
+        return folder, os.path.join(folder, f"{key}.json")
+
+    def _load(self, key):
+        folder, json_path = self._paths(key)
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, key, record):
+        folder, json_path = self._paths(key)
+        os.makedirs(folder, exist_ok=True)
+
+        # Atomic rename, so a half-written entry is never read
+        tmp_json = json_path + ".tmp"
+        with open(tmp_json, "w", encoding="utf-8") as f:
+            json.dump(record, f)
+        os.replace(tmp_json, json_path)
@@ -0,0 +1,71 @@
+import json
+import os
+
+from backends import DEFAULT_BACKEND, DEFAULT_CALIBRATION, DEFAULT_PRECISION
+from http_service import DEFAULT_HTTP_PORT, DEFAULT_MAX_CONCURRENT
+from inference_worker import MAX_BATCH, MAX_BATCH_DELAY_MS
+from model_registry import DEFAULT_MODEL
+from tiling import check_tiling
+from watch_folder import DEFAULT_WATCH_DIRS
+
+# User settings persisted between sessions, next to NeuroVision_Results
+SETTINGS_PATH = os.environ.get("NEUROVISION_SETTINGS", "neurovision_settings.json")
+
+DEFAULT_SETTINGS = {
+    # Entry of neurovision_models.json the app loads, switchable from the header
+    "model": DEFAULT_MODEL,
+    "backend": DEFAULT_BACKEND,
+    # "fp32", "bf16" (PyTorch) or "int8-dynamic" / "int8-static" (ONNX Runtime)
+    "precision": DEFAULT_PRECISION,
+    # Scans used to calibrate static INT8 and to measure accuracy against FP32
+    "calibration_dir": DEFAULT_CALIBRATION,
+    # Model input size; exported backends are re-exported when it changes
+    "imgsz": int(os.environ.get("NEUROVISION_IMGSZ", "640")),
+    # Quick low-resolution pass shown while the full-size result is computed, 0 to disable
+    "preview_imgsz": 320,
+    # Queued scans are run together in one forward pass of up to max_batch images,
+    # waiting at most batch_delay_ms for more to arrive (max_batch 1 = off)
+    "max_batch": MAX_BATCH,
+    "batch_delay_ms": MAX_BATCH_DELAY_MS,
+    # Sliding-window inference for scans larger than one tile
+    "tiled": False,
+    "tile_size": 640,
+    "tile_overlap": 0.2,
+    "tile_merge": "wbf",  # or "nms"
+    # Saved results: "png", "webp" or "jpeg"; quality is for WebP/JPEG (100 = lossless WebP)
+    "export_format": "png",
+    "export_quality": 95,
+    "export_png_compression": 6,
+    "export_dir": "NeuroVision_Results",
+    # Folders scanners export into; new scans are detected automatically while watching
+    "watch_dirs": DEFAULT_WATCH_DIRS,
+    "watch_enabled": bool(DEFAULT_WATCH_DIRS),
+    "watch_settle_seconds": 2.0,
+    "watch_poll_seconds": 2.0,
+    # Localhost HTTP service sharing the loaded model with other tools, 0 = off
+    "http_port": DEFAULT_HTTP_PORT,
+    "http_max_concurrent": DEFAULT_MAX_CONCURRENT,
+}
+
+
+def load_settings(path=SETTINGS_PATH):
+    settings = dict(DEFAULT_SETTINGS)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            settings.update(json.load(f))
+    except (OSError, ValueError):
+        pass
+    try:
+        check_tiling(settings["tile_size"], settings["tile_overlap"])
+    except (TypeError, ValueError) as e:
+        print(f"Ignoring tile settings in {path}: {e}")
+        settings["tile_size"] = DEFAULT_SETTINGS["tile_size"]
+        settings["tile_overlap"] = DEFAULT_SETTINGS["tile_overlap"]
+    return settings
+
+
+def save_settings(settings, path=SETTINGS_PATH):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(settings, f, indent=2)
+    os.replace(tmp_path, path)
@@ -0,0 +1,182 @@
+import threading
+import time
+from collections import deque
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+
+class P2Quantile:
+    """Streaming quantile estimate in O(1) memory (Jain & Chlamtac P-square algorithm)"""
+
+    def __init__(self, quantile):
+        self.quantile = quantile
+        self.count = 0
+        self._initial = []
+        self._heights = []
+        self._positions = [1, 2, 3, 4, 5]
+        self._desired = [1, 1 + 2 * quantile, 1 + 4 * quantile, 3 + 2 * quantile, 5]
+        self._increments = [0, quantile / 2, quantile, (1 + quantile) / 2, 1]
+
+    def add(self, value):
+        self.count += 1
+        if self.count <= 5:
+            self._initial.append(value)
+            if self.count == 5:
+                self._heights = sorted(self._initial)
+            return
+
+        heights, positions = self._heights, self._positions
+
+        # Find the cell the value falls in, stretching the extremes if needed
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = next(i for i in range(4) if heights[i] <= value < heights[i + 1])
+
+        for i in range(cell + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        # Nudge the three middle markers towards their desired positions
+        for i in range(1, 4):
+            delta = self._desired[i] - positions[i]
+            if (delta >= 1 and positions[i + 1] - positions[i] > 1) or \
+               (delta <= -1 and positions[i - 1] - positions[i] < -1):
+                step = 1 if delta > 0 else -1
+                height = self._parabolic(i, step)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = self._linear(i, step)
+                heights[i] = height
+                positions[i] += step
+
+    def _parabolic(self, i, step):
+        h, n = self._heights, self._positions
+        return h[i] + step / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + step) * (h[i + 1] - h[i]) / (n[i + 1] - n[i]) +
+            (n[i + 1] - n[i] - step) * (h[i] - h[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def _linear(self, i, step):
+        h, n = self._heights, self._positions
+        return h[i] + step * (h[i + step] - h[i]) / (n[i + step] - n[i])
+
+    def value(self):
+        if self.count == 0:
+            return None
+        if self.count <= 5:
+            ordered = sorted(self._initial)
+            return ordered[min(len(ordered) - 1, int(round(self.quantile * (len(ordered) - 1))))]
+        return self._heights[2]
+
+
+class DetectionStats:
+    """Running detection statistics, each update is O(1) regardless of history length"""
+
+    def __init__(self, confidence_bins=10, throughput_window=60.0):
+        self.positive = 0
+        self.negative = 0
+        self.latency = {name: P2Quantile(q) for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))}
+        self.confidence_bins = [0] * confidence_bins
+        self.throughput_window = throughput_window
+        self._recent = deque()
+
+    @property
+    def total(self):
+        return self.positive + self.negative
+
+    def add(self, result, time_taken=None, confidence=None, when=None):
+        if result == "Positive":
+            self.positive += 1
+        else:
+            self.negative += 1
+
+        if time_taken is not None:
+            for estimator in self.latency.values():
+                estimator.add(time_taken)
+
+        if confidence is not None:
+            index = min(int(confidence * len(self.confidence_bins)), len(self.confidence_bins) - 1)
+            self.confidence_bins[max(0, index)] += 1
+
+        now = time.monotonic() if when is None else when
+        self._recent.append(now)
+        self._expire(now)
+
+    def add_entry(self, entry):
+        """Update from a history entry dict"""
+        # Negative entries carry a placeholder confidence, only detections are binned
+        confidence = entry.get("confidence") if entry["result"] == "Positive" else None
+        # A volume's time covers the whole study, it would skew the per-scan latency
+        time_taken = None if entry.get("volume") else entry.get("time_taken")
+        self.add(entry["result"], time_taken, confidence)
+
+    def throughput_per_minute(self, now=None):
+        self._expire(time.monotonic() if now is None else now)
+        return len(self._recent) * 60.0 / self.throughput_window
+
+    def latency_text(self):
+        values = {name: estimator.value() for name, estimator in self.latency.items()}
+        if values["p50"] is None:
+            return "Latency: -"
+        return "Latency p50/p95/p99: " + " / ".join(f"{values[name]:.2f}s" for name in ("p50", "p95", "p99"))
+
+    def confidence_sparkline(self):
+        peak = max(self.confidence_bins)
+        if peak == 0:
+            return ""
+        return "".join(SPARK_CHARS[round(count / peak * (len(SPARK_CHARS) - 1))] for count in self.confidence_bins)
+
+    def _expire(self, now):
+        while self._recent and now - self._recent[0] > self.throughput_window:
+            self._recent.popleft()
+
+
+class BatchStats:
+    """Achieved batch size and queueing delay of the inference server's micro-batching.
+
+    Fed with every record the server returns; records carry the number of images in
+    the forward pass that produced them and how long the job waited to be batched.
+    """
+
+    def __init__(self):
+        self.images = 0
+        self.batch_sizes = {}  # images in the forward pass -> images that ran in such a pass
+        self.queue_delay = {name: P2Quantile(q) for name, q in (("p50", 0.5), ("p95", 0.95))}
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        size = record.get("batch_size")
+        if size is None:
+            return
+        with self._lock:
+            self.images += 1
+            self.batch_sizes[size] = self.batch_sizes.get(size, 0) + 1
+            delay = record.get("stages_ms", {}).get("queue")
+            if delay is not None:
+                for estimator in self.queue_delay.values():
+                    estimator.add(delay)
+
+    def summary(self):
+        with self._lock:
+            # Each pass of n images reports n records, so count passes rather than records
+            passes = sum(count / size for size, count in self.batch_sizes.items())
+            mean = self.images / passes if passes else None
+            return {
+                "images": self.images,
+                "mean_batch_size": round(mean, 2) if mean is not None else None,
+                "batch_sizes": dict(sorted(self.batch_sizes.items())),
+                "queue_ms_p50": self.queue_delay["p50"].value(),
+                "queue_ms_p95": self.queue_delay["p95"].value(),
+            }
+
+    def text(self):
+        summary = self.summary()
+        if not summary["images"]:
+            return "Batching: -"
+        return (f"Batching: {summary['mean_batch_size']:.1f} images/pass, queue p50/p95 "
+                f"{summary['queue_ms_p50']:.1f} / {summary['queue_ms_p95']:.1f}ms")
@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+from stats import DetectionStats, P2Quantile
+
+
+def exact_quantile(values, quantile):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(quantile * (len(ordered) - 1))))]
+
+
+@pytest.mark.parametrize("quantile", [0.5, 0.95, 0.99])
+def test_p2_quantile_tracks_exact_quantile(quantile):
+    rng = random.Random(1234)
+    # Skewed like real latencies: a long tail above the median
+    values = [rng.lognormvariate(0, 0.5) for _ in range(20000)]
+    estimator = P2Quantile(quantile)
+    for value in values:
+        estimator.add(value)
+    assert estimator.count == len(values)
+    assert estimator.value() == pytest.approx(exact_quantile(values, quantile), rel=0.03)
+
+
+def test_p2_quantile_warm_up_is_exact():
+    estimator = P2Quantile(0.5)
+    assert estimator.value() is None
+    for value in (3.0, 1.0, 2.0):
+        estimator.add(value)
+    assert estimator.value() == 2.0
+
+    tail = P2Quantile(0.99)
+    for value in (3.0, 1.0, 2.0, 5.0):
+        tail.add(value)
+    assert tail.value() == 5.0
+
+
+def test_p2_quantile_switches_to_markers_after_five_values():
+    estimator = P2Quantile(0.5)
+    for value in (5.0, 4.0, 3.0, 2.0, 1.0):
+        estimator.add(value)
+    assert estimator.value() == 3.0
+    estimator.add(3.5)
+    assert 2.0 <= estimator.value() <= 4.0
+
+
+def test_add_entry_bins_only_positive_confidences():
+    stats = DetectionStats(confidence_bins=10)
+    stats.add_entry({"result": "Negative", "confidence": 0.95, "time_taken": 0.1})
+    assert stats.confidence_bins == [0] * 10
+    assert stats.negative == 1
+
+    stats.add_entry({"result": "Positive", "confidence": 0.75, "time_taken": 0.1})
+    assert stats.confidence_bins[7] == 1
+    assert sum(stats.confidence_bins) == 1
+    assert stats.positive == 1
+
+
+def test_add_entry_keeps_volume_times_out_of_latency():
+    stats = DetectionStats()
+    stats.add_entry({"result": "Positive", "confidence": 0.8, "time_taken": 0.2})
+    stats.add_entry({"result": "Positive", "confidence": 0.8, "time_taken": 30.0,
+                     "volume": "/scans/study1"})
+    assert stats.total == 2
+    assert all(estimator.count == 1 for estimator in stats.latency.values())
+    assert stats.latency["p99"].value() == 0.2
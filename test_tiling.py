@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from tiling import MAX_TILES, check_tiling, merge_detections, merge_tile_records, tile_windows
+
+
+def coverage(height, width, windows):
+    covered = np.zeros((height, width), dtype=bool)
+    for x0, y0, x1, y1 in windows:
+        covered[y0:y1, x0:x1] = True
+    return covered
+
+
+def test_tile_windows_cover_the_scan_with_the_last_tile_flush():
+    windows = tile_windows(1000, 1500, tile=640, overlap=0.2)
+    assert sorted({x0 for x0, _, _, _ in windows}) == [0, 512, 860]
+    assert sorted({y0 for _, y0, _, _ in windows}) == [0, 360]
+    assert all(x1 - x0 == 640 and y1 - y0 == 640 for x0, y0, x1, y1 in windows)
+    assert max(x1 for _, _, x1, _ in windows) == 1500
+    assert max(y1 for _, _, _, y1 in windows) == 1000
+    assert coverage(1000, 1500, windows).all()
+
+
+def test_tile_windows_single_tile_for_small_scans():
+    assert tile_windows(300, 500, tile=640, overlap=0.2) == [(0, 0, 500, 300)]
+
+
+def test_tile_windows_without_overlap_still_reach_the_edge():
+    windows = tile_windows(700, 700, tile=256, overlap=0)
+    assert sorted({x0 for x0, _, _, _ in windows}) == [0, 256, 444]
+    assert coverage(700, 700, windows).all()
+
+
+def test_tile_windows_limit_the_tile_count():
+    # 32 x 32 tiles of 64px without overlap is exactly the limit
+    assert len(tile_windows(2048, 2048, tile=64, overlap=0)) == MAX_TILES == 32 * 32
+    with pytest.raises(ValueError, match="tiles"):
+        tile_windows(2049, 2049, tile=64, overlap=0)
+    with pytest.raises(ValueError, match="tiles"):
+        tile_windows(8192, 8192, tile=64, overlap=0.9)
+
+
+@pytest.mark.parametrize("tile, overlap", [(32, 0.2), (8193, 0.2), (640, -0.1), (640, 0.95), (640, 1.0)])
+def test_check_tiling_rejects_bad_settings(tile, overlap):
+    with pytest.raises(ValueError):
+        check_tiling(tile, overlap)
+    with pytest.raises(ValueError):
+        tile_windows(4000, 4000, tile, overlap)
+
+
+@pytest.mark.parametrize("tile, overlap", [(64, 0), (8192, 0.9), (640, 0.2)])
+def test_check_tiling_accepts_the_limits(tile, overlap):
+    check_tiling(tile, overlap)
+
+
+def test_nms_with_ios_drops_a_box_cut_by_a_tile_edge():
+    # The partial box lies inside the full one: IoS 1.0, but IoU only 0.4
+    boxes = [[0, 0, 100, 100], [0, 0, 40, 100]]
+    merged, confidences, _ = merge_detections(boxes, [0.9, 0.8], [0, 0], method="nms", metric="ios")
+    assert merged.tolist() == [[0, 0, 100, 100]]
+    assert confidences.tolist() == [0.9]
+
+    merged, _, _ = merge_detections(boxes, [0.9, 0.8], [0, 0], method="nms", metric="iou")
+    assert len(merged) == 2
+
+
+def test_wbf_averages_overlapping_boxes_by_confidence():
+    boxes = [[0, 0, 100, 100], [10, 10, 110, 110]]
+    merged, confidences, classes = merge_detections(boxes, [0.9, 0.3], [1, 1], method="wbf")
+    assert merged.shape == (1, 4)
+    np.testing.assert_allclose(merged[0], [2.5, 2.5, 102.5, 102.5])
+    # A lesion seen in more tiles keeps its best single score
+    assert confidences.tolist() == [0.9]
+    assert classes.tolist() == [1]
+
+
+def test_merge_keeps_separate_boxes_and_classes_apart():
+    boxes = [[0, 0, 50, 50], [200, 200, 250, 250], [0, 0, 50, 50]]
+    merged, confidences, classes = merge_detections(boxes, [0.9, 0.8, 0.7], [0, 0, 1])
+    assert len(merged) == 3
+    assert sorted(classes.tolist()) == [0, 0, 1]
+
+
+def test_merge_detections_with_nothing_detected():
+    merged, confidences, classes = merge_detections([], [], [])
+    assert merged.shape == (0, 4)
+    assert len(confidences) == len(classes) == 0
+
+
+def test_merge_tile_records_maps_tiles_back_to_scan_coordinates():
+    # One lesion across the seam between two 640px tiles, the second starting at x=512
+    records = [
+        {"boxes": [[500, 100, 600, 200]], "confidences": [0.9], "classes": [0], "labels": ["tumor"]},
+        {"boxes": [[0, 100, 88, 200]], "confidences": [0.6], "classes": [0], "labels": ["tumor"]},
+    ]
+    placements = [{"offset": (0, 0)}, {"offset": (512, 0)}]
+    merged = merge_tile_records(records, placements, (640, 1152))
+    assert merged["result"] == "Positive"
+    assert merged["regions"] == 1
+    assert merged["tiles"] == 2
+    assert merged["labels"] == ["tumor"]
+    assert merged["confidence"] == 0.9
+    x1, y1, x2, y2 = merged["boxes"][0]
+    assert 500 <= x1 < 512 and x2 == 600 and (y1, y2) == (100, 200)
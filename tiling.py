@@ -0,0 +1,211 @@
+"""
+NeuroVision AI - tiled sliding-window inference
+
+Large scans are normally shrunk to the model input size, which can make small
+lesions disappear. In tiled mode the scan is cut into overlapping tiles at
+native resolution (plus one downscaled pass of the whole scan for lesions
+larger than a tile), all tiles are run as a batch and the detections are
+mapped back to scan coordinates and merged across tiles with NMS or weighted
+box fusion.
+"""
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+
+from detector import unletterbox_record
+from image_loader import letterbox, to_model_input
+
+MERGE_METHODS = ("wbf", "nms")
+
+MIN_TILE_SIZE = 64
+MAX_TILE_SIZE = 8192
+MAX_TILE_OVERLAP = 0.9
+# More tiles than this for one scan means the tile size or overlap is a mistake
+MAX_TILES = 1024
+
+
+def check_tiling(tile, overlap):
+    """Raise ValueError for a tile size or overlap that would leave gaps or explode the tile count"""
+    if not MIN_TILE_SIZE <= tile <= MAX_TILE_SIZE:
+        raise ValueError(f"Tile size must be between {MIN_TILE_SIZE} and {MAX_TILE_SIZE} pixels, got {tile}")
+    if not 0 <= overlap <= MAX_TILE_OVERLAP:
+        raise ValueError(f"Tile overlap must be between 0 and {MAX_TILE_OVERLAP}, got {overlap}")
+
+
+def tile_windows(height, width, tile=640, overlap=0.2):
+    """(x0, y0, x1, y1) windows of at most tile x tile pixels covering the whole image"""
+    check_tiling(tile, overlap)
+    stride = max(1, int(tile * (1 - overlap)))
+
+    def starts(length):
+        if length <= tile:
+            return [0]
+        positions = list(range(0, length - tile, stride))
+        positions.append(length - tile)  # last tile flush with the edge
+        return positions
+
+    rows, columns = starts(height), starts(width)
+    if len(rows) * len(columns) > MAX_TILES:
+        raise ValueError(f"A {width}x{height} scan would need {len(rows) * len(columns)} tiles of {tile}px "
+                         f"(at most {MAX_TILES}); use larger tiles or less overlap")
+    return [(x, y, min(x + tile, width), min(y + tile, height)) for y in rows for x in columns]
+
+
+def tiled_sources(pixels, tile=640, overlap=0.2, imgsz=640, include_full=True):
+    """BGR model inputs for every tile and where each one sits in the scan"""
+    height, width = pixels.shape[:2]
+    sources = []
+    placements = []
+    for x0, y0, x1, y1 in tile_windows(height, width, tile, overlap):
+        sources.append(to_model_input(pixels[y0:y1, x0:x1]))
+        placements.append({"offset": (x0, y0)})
+
+    if include_full and len(sources) > 1:
+        boxed, scale, pad = letterbox(pixels, imgsz)
+        sources.append(boxed)
+        placements.append({"letterbox": {"scale": scale, "pad": pad, "orig_shape": (height, width)}})
+    return sources, placements
+
+
+def _overlap(box, boxes, metric="ios"):
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    if metric == "iou":
+        denominator = area + areas - inter
+    else:
+        # Intersection over the smaller box: a lesion cut by a tile edge gives a partial
+        # box that lies mostly inside the full one but has a low IoU with it
+        denominator = np.minimum(area, areas)
+    return inter / np.maximum(denominator, 1e-9)
+
+
+def merge_detections(boxes, confidences, classes, threshold=0.5, method="wbf", metric="ios"):
+    """Merge duplicate detections per class; returns (boxes, confidences, classes) arrays"""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    confidences = np.asarray(confidences, dtype=np.float64)
+    classes = np.asarray(classes, dtype=np.int64)
+
+    merged_boxes, merged_conf, merged_cls = [], [], []
+    for cls in np.unique(classes):
+        index = np.flatnonzero(classes == cls)
+        index = index[np.argsort(-confidences[index])]
+
+        if method == "nms":
+            while len(index):
+                best, rest = index[0], index[1:]
+                merged_boxes.append(boxes[best])
+                merged_conf.append(confidences[best])
+                merged_cls.append(cls)
+                index = rest[_overlap(boxes[best], boxes[rest], metric) <= threshold]
+            continue
+
+        # Weighted box fusion: clusters are averaged weighted by confidence, so boxes seen
+        # in several overlapping tiles settle between them instead of picking one
+        clusters, fused = [], []
+        for i in index:
+            if fused:
+                overlaps = _overlap(boxes[i], np.array(fused), metric)
+                j = int(np.argmax(overlaps))
+                if overlaps[j] > threshold:
+                    clusters[j].append(i)
+                    weights = confidences[clusters[j]]
+                    fused[j] = (boxes[clusters[j]] * weights[:, None]).sum(axis=0) / weights.sum()
+                    continue
+            clusters.append([i])
+            fused.append(boxes[i].copy())
+        for members, box in zip(clusters, fused):
+            merged_boxes.append(box)
+            # A lesion seen in more tiles is not more likely, keep the best single score
+            merged_conf.append(confidences[members].max())
+            merged_cls.append(cls)
+
+    return (np.array(merged_boxes, dtype=np.float64).reshape(-1, 4),
+            np.array(merged_conf, dtype=np.float64),
+            np.array(merged_cls, dtype=np.int64))
+
+
+def merge_tile_records(records, placements, orig_shape, threshold=0.5, method="wbf"):
+    """Combine per-tile detection records into one record in scan coordinates"""
+    boxes, confidences, classes = [], [], []
+    names = {}
+    stages = {}
+    for record, placement in zip(records, placements):
+        if "letterbox" in placement:
+            unletterbox_record(record, placement["letterbox"])
+            tile_boxes = record["boxes"]
+        else:
+            x0, y0 = placement["offset"]
+            tile_boxes = [[x1 + x0, y1 + y0, x2 + x0, y2 + y0] for x1, y1, x2, y2 in record["boxes"]]
+        boxes.extend(tile_boxes)
+        confidences.extend(record["confidences"])
+        classes.extend(record["classes"])
+        names.update(zip(record["classes"], record["labels"]))
+        # Tiles may run on different workers at once, so keep the slowest of each stage
+        for name, ms in record.get("stages_ms", {}).items():
+            stages[name] = max(stages.get(name, 0.0), ms)
+
+    merged_boxes, merged_conf, merged_cls = merge_detections(boxes, confidences, classes, threshold, method)
+    order = np.argsort(-merged_conf)
+    merged_cls = merged_cls[order].tolist()
+
+    merged = {
+        "result": "Positive" if len(order) else "Negative",
+        "regions": len(order),
+        "boxes": [[round(float(v), 2) for v in box] for box in merged_boxes[order]],
+        "confidences": [round(float(c), 4) for c in merged_conf[order]],
+        "classes": merged_cls,
+        "labels": [names.get(c, str(c)) for c in merged_cls],
+        "confidence": float(merged_conf.max()) if len(order) else None,
+        "orig_shape": list(orig_shape),
+        "speed_ms": {},
+        "tiles": len(records),
+    }
+    if stages:
+        merged["stages_ms"] = stages
+    return merged
+
+
+def detect_tiled(model, pixels, conf=0.25, imgsz=640, tile=640, overlap=0.2, method="wbf", threshold=0.5):
+    """Run every tile of one scan as a single batch and return the merged record"""
+    from detector import detect_batch
+
+    sources, placements = tiled_sources(pixels, tile, overlap, imgsz)
+    records = detect_batch(model, sources, conf=conf, imgsz=imgsz)
+    merged = merge_tile_records(records, placements, pixels.shape[:2], threshold, method)
+    merged["time_taken"] = records[0]["batch_time_s"]
+    return merged
+
+
+def submit_tiled(pool, pixels, conf=0.25, tile=640, overlap=0.2, method="wbf", threshold=0.5):
+    """Spread the tiles of one scan over the pool's workers; the Future holds the merged record"""
+    sources, placements = tiled_sources(pixels, tile, overlap, pool.imgsz)
+    chunks = max(1, min(pool.workers, len(sources)))
+    bounds = np.linspace(0, len(sources), chunks + 1).astype(int)
+
+    futures = [pool.submit_batch(sources[start:end], conf=conf)
+               for start, end in zip(bounds[:-1], bounds[1:])]
+    merged_future = Future()
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def chunk_done(_):
+        # Called on the pool's listener thread as each chunk comes back
+        with lock:
+            remaining[0] -= 1
+            if remaining[0]:
+                return
+        try:
+            records = [record for future in futures for record in future.result()]
+            merged_future.set_result(merge_tile_records(records, placements, pixels.shape[:2], threshold, method))
+        except Exception as e:
+            merged_future.set_exception(e)
+
+    for future in futures:
+        future.add_done_callback(chunk_done)
+    return merged_future
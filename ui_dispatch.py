@@ -0,0 +1,53 @@
+import itertools
+import threading
+from collections import OrderedDict
+
+
+class UIDispatcher:
+    """Queue of UI updates that any thread can post to, drained on the Tk thread.
+
+    Updates posted with the same key are coalesced so only the latest one runs,
+    e.g. several status messages arriving within one frame cost a single redraw.
+    At most max_per_frame callbacks run per drain, the rest wait for the next one.
+    """
+
+    def __init__(self, window, interval_ms=16, max_per_frame=50):
+        self.window = window
+        self.interval_ms = interval_ms
+        self.max_per_frame = max_per_frame
+        self._lock = threading.Lock()
+        self._queue = OrderedDict()
+        self._ids = itertools.count()
+        self._running = False
+
+    def post(self, fn, *args, key=None):
+        """Schedule fn(*args) on the Tk thread; never blocks the caller"""
+        with self._lock:
+            if key is None:
+                key = ("_unkeyed", next(self._ids))
+            # Re-inserting moves a coalesced update behind everything posted before it
+            self._queue.pop(key, None)
+            self._queue[key] = (fn, args)
+
+    def start(self):
+        self._running = True
+        self.window.after(self.interval_ms, self._drain)
+
+    def stop(self):
+        self._running = False
+
+    def _drain(self):
+        if not self._running:
+            return
+
+        with self._lock:
+            count = min(len(self._queue), self.max_per_frame)
+            batch = [self._queue.popitem(last=False)[1] for _ in range(count)]
+
+        for fn, args in batch:
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"Error in UI update {getattr(fn, '__name__', fn)}: {e}")
+
+        self.window.after(self.interval_ms, self._drain)
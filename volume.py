@@ -0,0 +1,155 @@
+import os
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from image_loader import apply_window, auto_window, is_dicom, read_dicom, to_model_input
+
+# Optional readers, only needed for the matching volume formats
+try:
+    import pydicom
+except ImportError:
+    pydicom = None
+
+try:
+    import nibabel
+except ImportError:
+    nibabel = None
+
+VOLUME_EXTENSIONS = (".npy", ".nii", ".nii.gz", ".dcm")
+
+
+class Volume(ABC):
+    """A stack of 2D slices that are decoded one at a time, never all at once"""
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path.rstrip("/\\"))
+
+    @abstractmethod
+    def __len__(self):
+        ...
+
+    @abstractmethod
+    def get_slice(self, index):
+        """Slice as HxW uint8, ready for display or to_model_input()"""
+
+
+class DicomSeries(Volume):
+    """One DICOM file per slice; only headers are read up front to sort the series"""
+
+    def __init__(self, folder):
+        super().__init__(folder)
+        if pydicom is None:
+            raise RuntimeError("DICOM support needs pydicom: pip install pydicom pylibjpeg")
+
+        slices = []
+        for filename in os.listdir(folder):
+            path = os.path.join(folder, filename)
+            if not os.path.isfile(path) or not is_dicom(path):
+                continue
+            ds = pydicom.dcmread(path, stop_before_pixels=True)
+            position = getattr(ds, "ImagePositionPatient", None)
+            order = float(position[2]) if position else float(getattr(ds, "InstanceNumber", 0) or 0)
+            slices.append((order, path))
+
+        if not slices:
+            raise ValueError(f"No DICOM slices found in {folder}")
+        self.files = [path for _, path in sorted(slices)]
+
+    def __len__(self):
+        return len(self.files)
+
+    def get_slice(self, index):
+        return read_dicom(self.files[index])
+
+
+class DicomMultiFrame(Volume):
+    """Enhanced/multi-frame DICOM; frames are decoded individually where pydicom allows it"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        if pydicom is None:
+            raise RuntimeError("DICOM support needs pydicom: pip install pydicom pylibjpeg")
+        ds = pydicom.dcmread(path, stop_before_pixels=True)
+        self.frames = int(getattr(ds, "NumberOfFrames", 1) or 1)
+
+    def __len__(self):
+        return self.frames
+
+    def get_slice(self, index):
+        return read_dicom(self.path, frame=index)
+
+
+class ArrayVolume(Volume):
+    """NumPy (.npy, memory-mapped) or NIfTI volume, windowed consistently across slices"""
+
+    def __init__(self, path, data, axis):
+        super().__init__(path)
+        self.data = data
+        self.axis = axis
+        self.window = self._estimate_window()
+
+    def _estimate_window(self):
+        # Sample a handful of slices rather than scanning the whole volume
+        count = len(self)
+        step = max(1, count // 16)
+        samples = np.stack([self._raw_slice(i) for i in range(0, count, step)])
+        return auto_window(samples)
+
+    def _raw_slice(self, index):
+        if self.axis == 0:
+            return np.asarray(self.data[index])
+        return np.asarray(self.data[..., index])
+
+    def __len__(self):
+        return self.data.shape[self.axis]
+
+    def get_slice(self, index):
+        pixels = self._raw_slice(index)
+        if self.axis != 0:
+            # NIfTI stores slices column-major; rotate so anterior is up like the 2D scans
+            pixels = np.rot90(pixels)
+        return apply_window(pixels, *self.window)
+
+
+def open_volume(path):
+    """Open a volume lazily: a DICOM series folder (or any file in it), multi-frame DICOM,
+    NIfTI (.nii/.nii.gz) or a 3D NumPy array (.npy)"""
+    lower = path.lower()
+
+    if lower.endswith(".npy"):
+        data = np.load(path, mmap_mode="r")
+        if data.ndim != 3:
+            raise ValueError(f"Expected a 3D array, got shape {data.shape}")
+        return ArrayVolume(path, data, axis=0)
+
+    if lower.endswith((".nii", ".nii.gz")):
+        if nibabel is None:
+            raise RuntimeError("NIfTI support needs nibabel: pip install nibabel")
+        # dataobj is an array proxy; uncompressed files are memory-mapped
+        data = nibabel.load(path).dataobj
+        if len(data.shape) != 3:
+            raise ValueError(f"Expected a 3D volume, got shape {data.shape}")
+        return ArrayVolume(path, data, axis=2)
+
+    if os.path.isdir(path):
+        return DicomSeries(path)
+
+    if is_dicom(path):
+        if pydicom is None:
+            raise RuntimeError("DICOM support needs pydicom: pip install pydicom pylibjpeg")
+        ds = pydicom.dcmread(path, stop_before_pixels=True)
+        if int(getattr(ds, "NumberOfFrames", 1) or 1) > 1:
+            return DicomMultiFrame(path)
+        # A single slice picked from a series opens the whole series folder
+        return DicomSeries(os.path.dirname(path) or ".")
+
+    raise ValueError(f"Unsupported volume format: {path}")
+
+
+def iter_slice_batches(volume, batch_size=8):
+    """Yield (indices, model inputs) for consecutive slices, one batch in memory at a time"""
+    for start in range(0, len(volume), batch_size):
+        indices = list(range(start, min(start + batch_size, len(volume))))
+        yield indices, [to_model_input(volume.get_slice(i)) for i in indices]
@@ -0,0 +1,314 @@
+"""
+NeuroVision AI - watch-folder auto-ingest
+
+Monitors folders that scanners export into and queues every new scan for
+detection. File events come from watchdog (inotify, FSEvents, ReadDirectoryChangesW)
+when it is installed, otherwise the folders are polled. A file is only queued
+once its size and modification time have stopped changing, so partially
+written exports are never read. Jobs live in a small SQLite database; jobs
+that were queued or running when the app stopped are picked up again on the
+next start.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from detector import IMAGE_EXTENSIONS
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # polling fallback
+    FileSystemEventHandler = object
+    Observer = None
+
+# Folders to watch, separated by os.pathsep; the GUI also keeps them in its settings
+DEFAULT_WATCH_DIRS = [d for d in os.environ.get("NEUROVISION_WATCH", "").split(os.pathsep) if d]
+DEFAULT_QUEUE_PATH = os.environ.get("NEUROVISION_JOB_QUEUE", "neurovision_jobs.sqlite3")
+
+
+class JobQueue:
+    """Crash-safe FIFO of scans to process, stored in SQLite.
+
+    A job is identified by (path, size, mtime), so a scan that is overwritten with
+    new content is processed again while duplicate events for the same file are not.
+    """
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH, max_attempts=3):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                state TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                created REAL NOT NULL,
+                updated REAL NOT NULL,
+                UNIQUE (path, size, mtime_ns)
+            )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, id)")
+
+    def recover(self):
+        """Requeue jobs that were running when the app stopped; returns how many"""
+        with self._lock:
+            self._db.execute("UPDATE jobs SET state = 'failed', error = 'too many attempts', updated = ? "
+                             "WHERE state = 'running' AND attempts >= ?", (time.time(), self.max_attempts))
+            cursor = self._db.execute("UPDATE jobs SET state = 'queued', updated = ? WHERE state = 'running'",
+                                      (time.time(),))
+            return cursor.rowcount
+
+    def enqueue(self, path, size, mtime_ns):
+        """Add a scan unless this exact file version was seen before; True if it was added"""
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO jobs (path, size, mtime_ns, created, updated) VALUES (?, ?, ?, ?, ?)",
+                (path, size, mtime_ns, now, now))
+            return cursor.rowcount > 0
+
+    def claim(self):
+        """Mark the oldest queued job as running and return (id, path), or None"""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT id, path FROM jobs WHERE state = 'queued' ORDER BY id LIMIT 1").fetchone()
+                if row is not None:
+                    self._db.execute("UPDATE jobs SET state = 'running', attempts = attempts + 1, updated = ? "
+                                     "WHERE id = ?", (time.time(), row[0]))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return row
+
+    def complete(self, job_id, result=None):
+        with self._lock:
+            self._db.execute("UPDATE jobs SET state = 'done', result = ?, error = NULL, updated = ? WHERE id = ?",
+                             (result, time.time(), job_id))
+
+    def fail(self, job_id, error):
+        """Requeue a job that failed, or give up on it after max_attempts"""
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+                "error = ?, updated = ? WHERE id = ?", (self.max_attempts, str(error), time.time(), job_id))
+
+    def counts(self):
+        with self._lock:
+            rows = self._db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.notice(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.notice(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.watcher.notice(event.dest_path)
+
+
+class FolderWatcher:
+    """Reports scans in the watched folders once they have finished being written.
+
+    on_ready(path, size, mtime_ns) is called from the watcher's thread. Existing
+    files are reported on start too; the job queue drops the ones already seen.
+    """
+
+    def __init__(self, folders, on_ready, settle_seconds=2.0, poll_seconds=2.0, recursive=True,
+                 use_watchdog=True):
+        self.folders = [os.path.abspath(f) for f in folders]
+        self.on_ready = on_ready
+        self.settle_seconds = settle_seconds
+        self.poll_seconds = poll_seconds
+        self.recursive = recursive
+        self.use_watchdog = use_watchdog and Observer is not None
+        self._candidates = {}  # path -> (size, mtime_ns, stable since)
+        self._reported = {}  # path -> (size, mtime_ns) last handed to on_ready
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._observer = None
+        self._thread = None
+
+    @property
+    def mode(self):
+        return "events" if self._observer is not None else "polling"
+
+    def start(self):
+        if self.use_watchdog:
+            observer = Observer()
+            handler = _EventHandler(self)
+            try:
+                for folder in self.folders:
+                    observer.schedule(handler, folder, recursive=self.recursive)
+                observer.start()
+                self._observer = observer
+            except OSError as e:
+                # e.g. inotify watch limit reached or a network share without change notifications
+                print(f"File events unavailable ({e}), polling the watch folders instead")
+        self._thread = threading.Thread(target=self._run, name="watch-folder", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=2)
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+
+    def notice(self, path):
+        """A file was created or changed; it is reported once it has settled"""
+        if not path.lower().endswith(IMAGE_EXTENSIONS) or os.path.basename(path).startswith("."):
+            return
+        with self._lock:
+            self._candidates.setdefault(path, None)
+
+    def _scan_folders(self):
+        for folder in self.folders:
+            for root, dirs, files in os.walk(folder):
+                for name in files:
+                    self.notice(os.path.join(root, name))
+                if not self.recursive:
+                    break
+
+    def _run(self):
+        self._scan_folders()
+        while not self._stop.wait(self.poll_seconds if self._observer is None else min(1.0, self.settle_seconds)):
+            if self._observer is None:
+                self._scan_folders()
+            self._check_candidates()
+
+    def _check_candidates(self):
+        now = time.monotonic()
+        with self._lock:
+            candidates = list(self._candidates.items())
+
+        ready = []
+        for path, previous in candidates:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                with self._lock:
+                    self._candidates.pop(path, None)
+                continue
+
+            current = (stat.st_size, stat.st_mtime_ns)
+            if previous is None or previous[:2] != current:
+                # Still being written (or first seen): restart the settle timer
+                with self._lock:
+                    self._candidates[path] = current + (now,)
+            elif stat.st_size > 0 and now - previous[2] >= self.settle_seconds:
+                ready.append((path, stat.st_size, stat.st_mtime_ns))
+
+        for path, size, mtime_ns in ready:
+            with self._lock:
+                self._candidates.pop(path, None)
+            # Polling sees every file again on each pass; only report new versions
+            if self._reported.get(path) != (size, mtime_ns):
+                self._reported[path] = (size, mtime_ns)
+                self.on_ready(path, size, mtime_ns)
+
+
+class WatchIngest:
+    """Moves scans from the watch folders through the job queue into the detector.
+
+    submit(path) is called on the ingest thread and returns a Future of the detection
+    record; capacity() is how many jobs may be in flight right now (0 while the
+    model is not ready). Jobs still in flight on stop() stay "running" in the queue
+    and are resumed on the next start.
+    """
+
+    def __init__(self, folders, submit, capacity, on_status=None, queue_path=DEFAULT_QUEUE_PATH,
+                 settle_seconds=2.0, poll_seconds=2.0):
+        self.queue = JobQueue(queue_path)
+        self.watcher = FolderWatcher(folders, self._on_ready, settle_seconds, poll_seconds)
+        self.submit = submit
+        self.capacity = capacity
+        self.on_status = on_status or (lambda message: None)
+        self._in_flight = 0
+        self._changed = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        recovered = self.queue.recover()
+        self.watcher.start()
+        self._thread = threading.Thread(target=self._run, name="watch-ingest", daemon=True)
+        self._thread.start()
+        queued = self.queue.counts().get("queued", 0)
+        self.on_status(f"Watching {len(self.watcher.folders)} folder(s) ({self.watcher.mode}), "
+                       f"{queued} scans queued" + (f", {recovered} resumed" if recovered else ""))
+
+    def stop(self):
+        with self._changed:
+            self._stopped = True
+            self._changed.notify_all()
+        self.watcher.stop()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.queue.close()
+
+    def _on_ready(self, path, size, mtime_ns):
+        if self.queue.enqueue(path, size, mtime_ns):
+            self.on_status(f"Queued {os.path.basename(path)} from watch folder")
+            with self._changed:
+                self._changed.notify_all()
+
+    def _run(self):
+        while True:
+            with self._changed:
+                # Woken by new jobs and finished ones; the timeout covers the model becoming ready
+                while not self._stopped and self._in_flight >= self.capacity():
+                    self._changed.wait(0.5)
+                if self._stopped:
+                    return
+                job = self.queue.claim()
+                if job is None:
+                    self._changed.wait(1.0)
+                    continue
+                self._in_flight += 1
+
+            job_id, path = job
+            try:
+                future = self.submit(path)
+            except Exception as e:
+                self._finished(job_id, error=e)
+                self.on_status(f"Could not read {os.path.basename(path)}: {e}")
+                continue
+            future.add_done_callback(lambda f, job_id=job_id: self._finished(job_id, future=f))
+
+    def _finished(self, job_id, future=None, error=None):
+        with self._changed:
+            self._in_flight -= 1
+            self._changed.notify_all()
+            if self._stopped:
+                return
+            if future is not None and future.exception() is not None:
+                error = future.exception()
+            if error is not None:
+                self.queue.fail(job_id, error)
+            else:
+                self.queue.complete(job_id, json.dumps(future.result()))